@@ -0,0 +1,314 @@
+"""Løbende statistik pr. medie og kategori, opdateret for hver ny analyse"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from sentiment import tokenize
+
+TOPICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'topics_da.json')
+BUCKET_SECONDS = 3600
+TOP_KEYWORDS = 10
+
+
+def parse_windows(spec):
+    """Læser fx '1d,7d,30d' til {'1d': 86400, ...}; enheder: h, d"""
+    units = {'h': 3600, 'd': 86400}
+    windows = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if part:
+            windows[part] = int(part[:-1]) * units[part[-1]]
+    return windows
+
+
+AGGREGATE_WINDOWS = parse_windows(os.getenv('AGGREGATE_WINDOWS', '1d,7d,30d'))
+AGGREGATE_CHECKPOINT_INTERVAL = float(os.getenv('AGGREGATE_CHECKPOINT_INTERVAL', '60'))
+# Nøgleord og emner der huskes for hele perioden; resten glemmes (de sjældneste først)
+AGGREGATE_ALL_TIME_TERMS = int(os.getenv('AGGREGATE_ALL_TIME_TERMS', '1000'))
+
+
+def load_topics(path=TOPICS_PATH):
+    """Returnerer opslag fra ord til de emner ordet indikerer"""
+    with open(path, encoding='utf-8') as f:
+        topics = json.load(f)
+    index = {}
+    for topic, words in topics.items():
+        for word in words:
+            index.setdefault(word.lower(), set()).add(topic)
+    return index
+
+
+def article_time(analysis, now):
+    """Publiceringstidspunktet som epoch, eller now hvis det mangler eller ligger i fremtiden"""
+    value = analysis.get('publish_date')
+    if isinstance(value, str):
+        try:
+            value = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                value = None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return min(value.timestamp(), now)
+    return now
+
+
+class Stats:
+    """Tællere for en mængde artikler; kan lægges til og trækkes fra hinanden"""
+
+    __slots__ = ('articles', 'sentiment', 'sources_count', 'keywords', 'topics')
+
+    def __init__(self):
+        self.articles = 0
+        self.sentiment = Counter()
+        self.sources_count = 0
+        self.keywords = Counter()
+        self.topics = Counter()
+
+    def add(self, other, sign=1):
+        self.articles += sign * other.articles
+        self.sources_count += sign * other.sources_count
+        for name in ('sentiment', 'keywords', 'topics'):
+            mine = getattr(self, name)
+            for key, count in getattr(other, name).items():
+                mine[key] += sign * count
+                if mine[key] <= 0:
+                    del mine[key]
+
+    def trim(self, limit):
+        """Beholder kun de limit hyppigste nøgleord og emner"""
+        for name in ('keywords', 'topics'):
+            counter = getattr(self, name)
+            if len(counter) > limit:
+                setattr(self, name, Counter(dict(counter.most_common(limit))))
+
+    def to_dict(self):
+        return {
+            'articles': self.articles,
+            'sentiment': dict(self.sentiment),
+            'sources_count': self.sources_count,
+            'keywords': dict(self.keywords),
+            'topics': dict(self.topics)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.articles = data['articles']
+        stats.sentiment.update(data['sentiment'])
+        stats.sources_count = data['sources_count']
+        stats.keywords.update(data['keywords'])
+        stats.topics.update(data['topics'])
+        return stats
+
+    def summary(self):
+        """Andele og top-lister som de vises i /api/stats"""
+        total_topics = sum(self.topics.values())
+        return {
+            'articles': self.articles,
+            'sentiment': {
+                label: round(count / self.articles, 3)
+                for label, count in self.sentiment.items()
+            } if self.articles else {},
+            'avg_sources_count': round(self.sources_count / self.articles, 2) if self.articles else None,
+            'top_keywords': self.keywords.most_common(TOP_KEYWORDS),
+            'topic_coverage': {
+                topic: round(count / total_topics, 2)
+                for topic, count in self.topics.most_common()
+            } if total_topics else {}
+        }
+
+
+class WindowedStats:
+    """Stats i timespande med løbende totaler for hvert tidsvindue.
+
+    En ny artikel lægges i sin time og i de vinduer den falder inden for.
+    Når tiden går, trækkes timer der falder ud af et vindue fra dets total,
+    så både opdatering og aflæsning er amortiseret O(1). Totalen for hele
+    perioden udløber aldrig; dens nøgleord og emner skæres derfor ned til de
+    all_time_terms hyppigste, når der er dobbelt så mange, og ved checkpoint.
+    """
+
+    def __init__(self, windows, all_time_terms=AGGREGATE_ALL_TIME_TERMS):
+        self.windows = windows
+        self.all_time_terms = all_time_terms
+        self.buckets = {}
+        self.totals = {name: Stats() for name in windows}
+        self.all_time = Stats()
+        self._low = {name: None for name in windows}
+
+    def _advance(self, now):
+        current = int(now // BUCKET_SECONDS)
+        moved = False
+        for name, seconds in self.windows.items():
+            low = current - seconds // BUCKET_SECONDS + 1
+            previous = self._low[name]
+            if previous is not None and previous >= low:
+                continue
+            if previous is not None:
+                expired = (
+                    range(previous, low) if low - previous <= len(self.buckets)
+                    else [bucket for bucket in self.buckets if previous <= bucket < low]
+                )
+                for bucket in expired:
+                    if bucket in self.buckets:
+                        self.totals[name].add(self.buckets[bucket], -1)
+            self._low[name] = low
+            moved = True
+        if moved:
+            # Timer der er ude af alle vinduer skal ikke huskes længere
+            oldest = min(self._low.values(), default=current)
+            for bucket in [bucket for bucket in self.buckets if bucket < oldest]:
+                del self.buckets[bucket]
+
+    def add(self, stats, timestamp, now):
+        self._advance(now)
+        self.all_time.add(stats)
+        if len(self.all_time.keywords) > 2 * self.all_time_terms:
+            self.all_time.trim(self.all_time_terms)
+        bucket = int(timestamp // BUCKET_SECONDS)
+        if bucket < min(self._low.values(), default=bucket):
+            return
+        self.buckets.setdefault(bucket, Stats()).add(stats)
+        for name, low in self._low.items():
+            if bucket >= low:
+                self.totals[name].add(stats)
+
+    def summary(self, now):
+        self._advance(now)
+        result = {name: total.summary() for name, total in self.totals.items()}
+        result['all'] = self.all_time.summary()
+        return result
+
+    def to_dict(self):
+        self.all_time.trim(self.all_time_terms)
+        return {
+            'buckets': {str(bucket): stats.to_dict() for bucket, stats in self.buckets.items()},
+            'all_time': self.all_time.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, windows, data, now):
+        windowed = cls(windows)
+        windowed.all_time = Stats.from_dict(data['all_time'])
+        windowed.all_time.trim(windowed.all_time_terms)
+        windowed._advance(now)
+        for bucket, stats in data['buckets'].items():
+            bucket = int(bucket)
+            stats = Stats.from_dict(stats)
+            if bucket < min(windowed._low.values(), default=bucket):
+                continue
+            windowed.buckets[bucket] = stats
+            for name, low in windowed._low.items():
+                if bucket >= low:
+                    windowed.totals[name].add(stats)
+        return windowed
+
+
+class Aggregator:
+    """Løbende statistik pr. medie og pr. kategori med checkpoint til disk"""
+
+    def __init__(self, categories, path=None, windows=AGGREGATE_WINDOWS,
+                 checkpoint_interval=AGGREGATE_CHECKPOINT_INTERVAL):
+        self.source_category = {
+            source: category
+            for category, sources in categories.items()
+            for source in sources
+        }
+        self.windows = windows
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.topics = load_topics()
+        self.outlets = {}
+        self.categories = {}
+        self.version = 0
+        self._lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self._load()
+        if path:
+            atexit.register(self.checkpoint)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Kunne ikke indlæse aggregater {self.path}: {str(e)}")
+            return
+        now = time.time()
+        for attr in ('outlets', 'categories'):
+            setattr(self, attr, {
+                name: WindowedStats.from_dict(self.windows, windowed, now)
+                for name, windowed in data.get(attr, {}).items()
+            })
+
+    def checkpoint(self):
+        """Skriver tællerne atomisk til disk"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                'outlets': {name: w.to_dict() for name, w in self.outlets.items()},
+                'categories': {name: w.to_dict() for name, w in self.categories.items()}
+            }
+            self._last_checkpoint = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Kunne ikke gemme aggregater {self.path}: {str(e)}")
+
+    def _article_stats(self, analysis):
+        stats = Stats()
+        stats.articles = 1
+        stats.sentiment[(analysis.get('sentiment') or {}).get('label', 'neutral')] += 1
+        stats.sources_count = analysis.get('sources_count') or 0
+        keywords = [keyword.lower() for keyword in analysis.get('keywords') or []]
+        stats.keywords.update(set(keywords))
+        words = set(keywords) | set(tokenize(analysis.get('title') or ''))
+        for word in words:
+            for topic in self.topics.get(word, ()):
+                stats.topics[topic] = 1
+        return stats
+
+    def add(self, source, analysis):
+        """Lægger en ny analyse til tællerne for mediet og dets kategori"""
+        if source is None:
+            return
+        now = time.time()
+        stats = self._article_stats(analysis)
+        timestamp = article_time(analysis, now)
+        category = self.source_category.get(source)
+        with self._lock:
+            for group, name in ((self.outlets, source), (self.categories, category)):
+                if name is None:
+                    continue
+                if name not in group:
+                    group[name] = WindowedStats(self.windows)
+                group[name].add(stats, timestamp, now)
+            self.version += 1
+            due = time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+        if due:
+            self.checkpoint()
+
+    def summary(self):
+        """Returnerer (pr. medie, pr. kategori) med en opsummering for hvert vindue"""
+        now = time.time()
+        with self._lock:
+            return (
+                {name: w.summary(now) for name, w in self.outlets.items()},
+                {name: w.summary(now) for name, w in self.categories.items()}
+            )
@@ -0,0 +1,240 @@
+"""Async hentning af forsider og artikler med httpx (bruges af asgi.py).
+
+Samme feeds, grænser pr. vært, robots.txt og circuit breakers som
+scraper.py, men ventetid på netværket binder ingen tråde. Udtræk af links
+kører i en trådpulje, så event-loopet ikke blokeres af HTML-parsing.
+"""
+import asyncio
+import functools
+import os
+import time
+
+import httpx
+
+from download import (
+    CHUNK_SIZE, DOWNLOAD_MAX_BYTES, FEED_TYPES, HTML_TYPES, StreamDecoder, TooLarge, UnsupportedContent,
+    check_headers
+)
+from metrics import ANALYZE_STAGE_SECONDS, FETCH_BYTES, FETCH_ERRORS, FETCH_SECONDS
+from politeness import BACKOFF_STATUS, Throttled, retry_after
+from scraper import (
+    CONNECT_TIMEOUT, DEADLINE, READ_TIMEOUT, USER_AGENT, cached_feed, conditional_headers,
+    remember_feed, scheduler
+)
+
+MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', '512'))
+
+_client = None
+
+
+def get_client():
+    """Returnerer den delte klient; oprettes i det kørende event-loop"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=64),
+            headers={'User-Agent': USER_AGENT},
+            follow_redirects=True
+        )
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _error_kind(error):
+    if isinstance(error, TooLarge):
+        return 'too_large'
+    if isinstance(error, UnsupportedContent):
+        return 'content_type'
+    if isinstance(error, httpx.HTTPStatusError):
+        return 'http'
+    if isinstance(error, httpx.TimeoutException):
+        return 'timeout'
+    if isinstance(error, httpx.TransportError):
+        return 'connection'
+    return 'other'
+
+
+async def _read_text(response, truncate=False):
+    """Læser og afkoder svarets krop som download.iter_text, med loftet DOWNLOAD_MAX_BYTES"""
+    decoder = StreamDecoder(response.headers.get('Content-Type'), truncate=truncate)
+    parts = []
+    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+        parts.append(decoder.feed(chunk))
+        if decoder.truncated:
+            break
+    parts.append(decoder.close())
+    return ''.join(parts)
+
+
+async def _read_bytes(response):
+    """Læser svarets krop med loftet DOWNLOAD_MAX_BYTES"""
+    body = bytearray()
+    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+        body += chunk
+        if len(body) > DOWNLOAD_MAX_BYTES:
+            raise TooLarge(f'Svaret er over loftet på {DOWNLOAD_MAX_BYTES} bytes')
+    return bytes(body)
+
+
+async def _download(source, url, extract, until, feed):
+    """Async modstykke til scraper._download; returnerer (artikler, svar)"""
+    headers = conditional_headers(url) if feed else {}
+    async with scheduler.aslot(url, until - time.monotonic()):
+        async with get_client().stream('GET', url, headers=headers) as response:
+            try:
+                if response.status_code in BACKOFF_STATUS:
+                    scheduler.back_off(url, retry_after(response.headers.get('Retry-After')))
+                if response.status_code == 304 and headers:
+                    articles = cached_feed(url)
+                    if articles is not None:
+                        return articles, response
+                response.raise_for_status()
+                if feed:
+                    check_headers(response.headers, FEED_TYPES)
+                    chunks = [await _read_bytes(response)]
+                else:
+                    check_headers(response.headers, HTML_TYPES, max_bytes=None)
+                    chunks = [await _read_text(response, truncate=True)]
+            finally:
+                FETCH_BYTES.inc(response.num_bytes_downloaded, source=source)
+    loop = asyncio.get_running_loop()
+    if feed:
+        articles = await loop.run_in_executor(
+            None, functools.partial(extract, source, str(response.url), chunks, kind='feed')
+        )
+        remember_feed(url, response.headers, articles)
+    else:
+        articles = await loop.run_in_executor(None, extract, source, str(response.url), chunks)
+    return articles, response
+
+
+async def _fetch_source(source, url, extract, until, feeds=()):
+    started = time.monotonic()
+    breaker = scheduler.breaker(source)
+    if not breaker.allow():
+        return [], {'status': 'circuit_open', 'elapsed_ms': 0, 'breaker': breaker.snapshot()}
+
+    failure = None
+    errors = []
+    try:
+        for target, feed in [(feed_url, True) for feed_url in feeds] + [(url, False)]:
+            # robots.txt hentes synkront første gang pr. vært og caches derefter
+            if not await asyncio.to_thread(scheduler.allowed, target, until):
+                errors.append(f'{target}: ikke tilladt af robots.txt')
+                continue
+            try:
+                articles, response = await _download(source, target, extract, until, feed)
+            except Throttled as e:
+                failure = failure or ('throttled', e)
+                errors.append(f'{target}: {str(e)}')
+                continue
+            except Exception as e:
+                print(f"Fejl ved hentning af {source} ({target}): {str(e)}")
+                FETCH_ERRORS.inc(source=source, kind=_error_kind(e))
+                failure = ('error', e)
+                errors.append(f'{target}: {str(e)}')
+                continue
+            if feed and not articles:
+                errors.append(f'{target}: ingen artikler')
+                continue
+            scheduler.succeeded(target)
+            break
+        else:
+            elapsed = time.monotonic() - started
+            if failure is None:
+                breaker.release()
+                return [], {
+                    'status': 'disallowed',
+                    'elapsed_ms': round(elapsed * 1000),
+                    'breaker': breaker.snapshot()
+                }
+            kind, error = failure
+            if kind == 'throttled':
+                breaker.release()
+            else:
+                breaker.record_failure()
+                FETCH_SECONDS.observe(elapsed, source=source)
+            return [], {
+                'status': kind,
+                'error': '; '.join(errors),
+                'elapsed_ms': round(elapsed * 1000),
+                'breaker': breaker.snapshot()
+            }
+    except asyncio.CancelledError:
+        # Fristen udløb; en eventuel halvåben prøve må ikke blokere breakeren
+        breaker.release()
+        raise
+
+    elapsed = time.monotonic() - started
+    breaker.record_success()
+    FETCH_SECONDS.observe(elapsed, source=source)
+    status = {
+        'status': 'ok',
+        'via': 'feed' if feed else 'homepage',
+        'url': target,
+        'http_status': response.status_code,
+        'elapsed_ms': round(elapsed * 1000),
+        'count': len(articles),
+        'breaker': breaker.snapshot()
+    }
+    if response.status_code == 304:
+        status['not_modified'] = True
+    if errors:
+        status['fallback_errors'] = errors
+    return articles, status
+
+
+async def iter_fetch(sources, extract, deadline=None, feeds=None):
+    """Async udgave af scraper.iter_fetch; hentninger efter fristen annulleres"""
+    deadline = DEADLINE if deadline is None else deadline
+    until = time.monotonic() + deadline
+    feeds = feeds or {}
+    tasks = {
+        asyncio.ensure_future(_fetch_source(source, url, extract, until, feeds.get(source, ()))): source
+        for source, url in sources.items()
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                articles, status = task.result()
+                yield tasks[task], articles, status
+    finally:
+        for task in pending:
+            task.cancel()
+
+    for task in pending:
+        source = tasks[task]
+        FETCH_ERRORS.inc(source=source, kind='deadline')
+        yield source, [], {
+            'status': 'timeout',
+            'elapsed_ms': round(deadline * 1000),
+            'breaker': scheduler.breaker(source).snapshot()
+        }
+
+
+async def download_article(url):
+    """Henter en artikels HTML; async modstykke til analysis.download_article"""
+    started = time.perf_counter()
+    try:
+        async with get_client().stream('GET', url) as response:
+            response.raise_for_status()
+            check_headers(response.headers)
+            html = await _read_text(response)
+    finally:
+        ANALYZE_STAGE_SECONDS.observe(time.perf_counter() - started, stage='download')
+    if not html:
+        raise ValueError(f'Ingen HTML fra {url}')
+    return html
@@ -0,0 +1,279 @@
+"""Analyse af enkelte artikler.
+
+Analysen er delt i to trin: download (netværk) og analyse af HTML (CPU), så
+batch-kørsler kan hente samtidigt i tråde og analysere i separate processer.
+"""
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import keywords
+from download import fetch_text
+from metrics import ANALYZE_STAGE_SECONDS
+from sentiment import score as score_sentiment
+
+NLTK_DATA_DIR = os.getenv('NLTK_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+# Ressourcer der installeres af build.sh; hentes kun her hvis NLTK_AUTO_DOWNLOAD=1
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+    'maxent_ne_chunker': 'chunkers/maxent_ne_chunker',
+    'words': 'corpora/words'
+}
+NLTK_AUTO_DOWNLOAD = os.getenv('NLTK_AUTO_DOWNLOAD', '0') == '1'
+# 'builtin' bruger keywords.py; 'newspaper' bruger Article.nlp() og kræver NLTK-data
+KEYWORD_EXTRACTOR = os.getenv('ANALYZE_KEYWORDS', 'builtin')
+
+# Kilder tælles som sætninger med et citat (anførselstegn eller citatstreg)
+# eller et udsagnsord der tilskriver et udsagn til nogen
+QUOTE_RE = re.compile(r'[„“”"«»]|^[–-]\s')
+ATTRIBUTION_RE = re.compile(
+    r'\b(?:siger|sagde|udtaler|udtalte|fortæller|fortalte|oplyser|oplyste|ifølge)\b', re.I
+)
+
+DOWNLOAD_WORKERS = int(os.getenv('ANALYZE_DOWNLOAD_WORKERS', '8'))
+# 0 analyserer i den kaldende tråd uden procespulje (serverless, se api/index.py)
+PROCESS_WORKERS = int(os.getenv('ANALYZE_PROCESS_WORKERS', str(os.cpu_count() or 1)))
+
+_download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix='download')
+_process_pool = None
+_process_pool_lock = threading.Lock()
+_nlp_ready = False
+_nlp_lock = threading.Lock()
+
+
+def ensure_nlp_resources():
+    """Gør NLTK-data klar første gang der analyseres (én gang pr. proces)"""
+    global _nlp_ready
+    if _nlp_ready:
+        return
+    with _nlp_lock:
+        if _nlp_ready:
+            return
+        import nltk
+
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+        for name, resource in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                if not NLTK_AUTO_DOWNLOAD:
+                    raise LookupError(
+                        f'NLTK-ressourcen {name} mangler i {NLTK_DATA_DIR}; kør build.sh'
+                    )
+                nltk.download(name, download_dir=NLTK_DATA_DIR, quiet=True)
+        _nlp_ready = True
+
+
+def prepare():
+    """Indlæser det analysen skal bruge, så første analyse ikke betaler for det"""
+    import newspaper  # noqa: F401
+
+    if KEYWORD_EXTRACTOR == 'newspaper':
+        ensure_nlp_resources()
+    else:
+        keywords.get_stopwords()
+        keywords.get_document_frequencies()
+
+
+def count_sources(text):
+    """Antal sætninger i teksten med citater eller kildeangivelser"""
+    return sum(
+        1 for sentence in keywords.split_sentences(text or '')
+        if QUOTE_RE.search(sentence) or ATTRIBUTION_RE.search(sentence)
+    )
+
+
+def download_article(url):
+    """Henter artiklens HTML streamet og med loftet DOWNLOAD_MAX_BYTES.
+
+    Kaster UnsupportedContent for svar der ikke er HTML og TooLarge for
+    svar over loftet, før hele svaret er læst.
+    """
+    # scraper indlæses først her, så procespuljens arbejdere ikke betaler for den
+    from scraper import CONNECT_TIMEOUT, READ_TIMEOUT, get_session
+
+    started = time.perf_counter()
+    try:
+        html = fetch_text(get_session(), url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    finally:
+        ANALYZE_STAGE_SECONDS.observe(time.perf_counter() - started, stage='download')
+    if not html:
+        raise ValueError(f'Ingen HTML fra {url}')
+    return html
+
+
+def record_timings(timings):
+    """Lægger varigheden af hvert analysetrin i histogrammet"""
+    for stage, seconds in timings.items():
+        ANALYZE_STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def _finish(analysis, timings, document):
+    """Gør analysen færdig i hovedprocessen og registrerer tider.
+
+    Nøgleord og resumé vægtes her med processens dokumentfrekvenser, som
+    derefter tæller artiklen med. Procespuljens arbejdere har hverken
+    friske frekvenser eller skriver deres egne.
+    """
+    if document is not None:
+        started = time.perf_counter()
+        analysis['keywords'], analysis['summary'] = keywords.rank(document)
+        timings['nlp'] = timings.get('nlp', 0.0) + time.perf_counter() - started
+        keywords.record_document(document.terms)
+    record_timings(timings)
+    return analysis
+
+
+def _analyze_html_timed(url, html):
+    """Som analyze_html, men returnerer (analyse, varighed pr. trin, opdelt tekst).
+
+    Med det indbyggede udtræk er nøgleord og resumé None, indtil _finish()
+    har vægtet den opdelte tekst (keywords.Document) i hovedprocessen; med
+    newspaper er den None. Tider returneres i stedet for at blive registreret
+    direkte, så de også kommer med når analysen kører i en anden proces.
+    """
+    timings = {}
+    started = time.perf_counter()
+    # newspaper indlæses først her, så opstart af appen er hurtig
+    from newspaper import Article
+
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    now = time.perf_counter()
+    timings['parse'], started = now - started, now
+
+    # Grundlæggende analyse
+    text = article.text
+    title = article.title
+    publish_date = article.publish_date
+
+    # Nøgleord og resumé (det indbyggede udtræk vægtes færdigt i _finish)
+    document = article_keywords = summary = None
+    if KEYWORD_EXTRACTOR == 'newspaper':
+        ensure_nlp_resources()
+        article.nlp()
+        article_keywords, summary = article.keywords, article.summary
+    else:
+        document = keywords.prepare(title, text)
+    now = time.perf_counter()
+    timings['nlp'], started = now - started, now
+
+    # Sentiment ud fra det danske leksikon i data/sentiment_da.tsv
+    sentiment = score_sentiment(text)
+    timings['sentiment'] = time.perf_counter() - started
+
+    # Kilde analyse
+    sources = count_sources(text)
+
+    return {
+        'title': title,
+        'publish_date': publish_date,
+        'sentiment': sentiment,
+        'sources_count': sources,
+        'keywords': article_keywords,
+        'summary': summary
+    }, timings, document
+
+
+def analyze_html(url, html):
+    """Parser og analyserer en allerede hentet artikel"""
+    return _finish(*_analyze_html_timed(url, html))
+
+
+def analyze_article(url):
+    """Analyserer en enkelt artikel"""
+    try:
+        return analyze_html(url, download_article(url))
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def _pool_context():
+    # fork fra en proces med tråde (Flask, crawler, jobkø) kan arve låse der
+    # aldrig frigives; forkserver/spawn starter arbejderne rent
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS, mp_context=_pool_context())
+        return _process_pool
+
+
+def _discard_process_pool():
+    """En død arbejdsproces ødelægger puljen; start en ny næste gang"""
+    global _process_pool
+    with _process_pool_lock:
+        _process_pool = None
+
+
+def submit_html(url, html):
+    """Sender analysen af en hentet artikel til procespuljen.
+
+    Returnerer en future med (analyse, varighed pr. trin, opdelt tekst); kaster
+    BrokenProcessPool hvis puljen er død, og puljen startes så forfra. Med
+    PROCESS_WORKERS=0 analyseres der med det samme, og futuren er færdig.
+    """
+    if PROCESS_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(_analyze_html_timed(url, html))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    try:
+        return _get_process_pool().submit(_analyze_html_timed, url, html)
+    except BrokenProcessPool:
+        _discard_process_pool()
+        raise
+
+
+def result_of(future):
+    """Analysen fra en future fra submit_html, gjort færdig med _finish()"""
+    try:
+        analysis, timings, document = future.result()
+    except BrokenProcessPool:
+        _discard_process_pool()
+        raise
+    return _finish(analysis, timings, document)
+
+
+def analyze_many(urls):
+    """Analyserer flere artikler og giver (url, analyse) efterhånden som de bliver færdige.
+
+    Downloads kører samtidigt i tråde, mens parsing og NLP kører i en
+    procespulje på tværs af kernerne. En fejl på én URL giver et
+    fejlresultat for netop den URL og stopper ikke resten.
+    """
+    downloads = {_download_executor.submit(download_article, url): url for url in urls}
+    analyses = {}
+    pending = set(downloads)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in downloads:
+                url = downloads.pop(future)
+                try:
+                    analysis = submit_html(url, future.result())
+                except Exception as e:
+                    yield url, {'error': str(e)}
+                else:
+                    analyses[analysis] = url
+                    pending.add(analysis)
+                continue
+
+            url = analyses.pop(future)
+            try:
+                yield url, result_of(future)
+            except Exception as e:
+                yield url, {'error': str(e)}
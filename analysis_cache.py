@@ -0,0 +1,211 @@
+"""To-lags cache for artikelanalyser: LRU i hukommelsen og SQLite på disk"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from records import AnalysisRecord
+from responses import json_default
+from urltools import canonicalize_url
+
+ANALYSIS_CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', str(6 * 3600)))
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', '512'))
+ANALYSIS_CACHE_DISK_BYTES = int(os.getenv('ANALYSIS_CACHE_DISK_BYTES', str(64 * 1024 * 1024)))
+
+
+class _Call:
+    """En igangværende analyse som andre forespørgsler kan vente på"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class AnalysisCache:
+    """Cache af analyser nøglet på den normaliserede URL.
+
+    Fejlresultater caches ikke. Samtidige forespørgsler på samme URL, der ikke
+    er i cachen, samles til én download og analyse.
+    """
+
+    def __init__(self, path=None, max_entries=ANALYSIS_CACHE_SIZE,
+                 ttl=ANALYSIS_CACHE_TTL, max_disk_bytes=ANALYSIS_CACHE_DISK_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0
+        }
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS analyses ('
+                'url TEXT PRIMARY KEY, payload TEXT NOT NULL, '
+                'created_at REAL NOT NULL, size INTEGER NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS analyses_created ON analyses (created_at)')
+            self._db.commit()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _get_memory(self, key, now):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] >= self.ttl:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry[1]
+
+    def _put_memory(self, key, value, created_at):
+        # Hukommelseslaget holder kompakte poster; get() giver en ny dict hver gang
+        record = AnalysisRecord.from_dict(value)
+        with self._lock:
+            self._memory[key] = (created_at, record)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._counters['memory_evictions'] += 1
+
+    def _get_disk(self, key, now):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                'SELECT payload, created_at FROM analyses WHERE url = ?', (key,)
+            ).fetchone()
+        if row is None or now - row[1] >= self.ttl:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _put_disk(self, key, payload, created_at):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO analyses (url, payload, created_at, size) VALUES (?, ?, ?, ?)',
+                (key, payload, created_at, len(payload))
+            )
+            # Fjern udløbne og derefter ældste rækker til vi er under loftet
+            self._db.execute('DELETE FROM analyses WHERE created_at < ?', (created_at - self.ttl,))
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM analyses').fetchone()[0]
+            if total > self.max_disk_bytes:
+                evicted = 0
+                for url, size in self._db.execute(
+                        'SELECT url, size FROM analyses ORDER BY created_at').fetchall():
+                    if total <= self.max_disk_bytes:
+                        break
+                    self._db.execute('DELETE FROM analyses WHERE url = ?', (url,))
+                    total -= size
+                    evicted += 1
+                with self._lock:
+                    self._counters['disk_evictions'] += evicted
+            self._db.commit()
+
+    def get(self, url):
+        """Slår en analyse op i cachen; returnerer None ved miss"""
+        key = canonicalize_url(url)
+        now = time.time()
+        record = self._get_memory(key, now)
+        if record is not None:
+            self._count('memory_hits')
+            return record.to_dict()
+        found = self._get_disk(key, now)
+        if found is not None:
+            value, created_at = found
+            self._put_memory(key, value, created_at)
+            self._count('disk_hits')
+            return value
+        return None
+
+    def put(self, url, analysis):
+        """Gemmer en analyse i begge lag og returnerer den serialiserbare udgave"""
+        key = canonicalize_url(url)
+        payload = json.dumps(analysis, ensure_ascii=False, default=json_default)
+        value = json.loads(payload)
+        created_at = time.time()
+        self._put_memory(key, value, created_at)
+        self._put_disk(key, payload, created_at)
+        return value
+
+    def get_or_compute(self, url, compute):
+        """Returnerer den cachede analyse eller beregner den med compute(url)"""
+        value = self.get(url)
+        if value is not None:
+            return value
+
+        key = canonicalize_url(url)
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self._counters['misses'] += 1
+            else:
+                self._counters['coalesced'] += 1
+        if not leader:
+            call.event.wait()
+            return call.result
+
+        try:
+            result = compute(url)
+            if 'error' not in result:
+                result = self.put(url, result)
+            call.result = result
+        except Exception as e:
+            call.result = {'error': str(e)}
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+        return result
+
+    def invalidate(self, url=None):
+        """Fjerner én URL fra cachen, eller alt hvis url er None. Returnerer antal fjernede"""
+        removed = 0
+        with self._lock:
+            if url is None:
+                removed = len(self._memory)
+                self._memory.clear()
+            else:
+                key = canonicalize_url(url)
+                removed = int(self._memory.pop(key, None) is not None)
+        if self._db is not None:
+            with self._db_lock:
+                if url is None:
+                    cursor = self._db.execute('DELETE FROM analyses')
+                else:
+                    cursor = self._db.execute('DELETE FROM analyses WHERE url = ?', (key,))
+                self._db.commit()
+            removed = max(removed, cursor.rowcount)
+        return removed
+
+    def stats(self):
+        """Tællere for hits, misses og størrelse"""
+        with self._lock:
+            stats = dict(self._counters, memory_entries=len(self._memory))
+        if self._db is not None:
+            with self._db_lock:
+                entries, size = self._db.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses'
+                ).fetchone()
+            stats.update(disk_entries=entries, disk_bytes=size)
+        return stats
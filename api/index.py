@@ -1,17 +1,35 @@
-from flask import Flask, jsonify
-from flask_cors import CORS
+"""Indgang for serverless-deploy (Vercel, se vercel.json).
 
-app = Flask(__name__)
-CORS(app)
+Serverer hele appen fra app.py. Modulet importeres én gang pr. instans, så
+forbindelsespuljer, NLP-data, det kodede /api/stats-svar og caches
+genbruges af alle kald på en varm instans.
+"""
+import os
+import sys
+import tempfile
 
-@app.route('/api', methods=['GET'])
-def home():
-    return jsonify({"status": "API is running"})
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
 
-def application(environ, start_response):
-    with app.request_context(environ):
-        response = app.dispatch_request()
-        status = f'{response.status_code} {response.status}'
-        response_headers = [(k, v) for k, v in response.headers.items()]
-        start_response(status, response_headers)
-        return [response.get_data()]
+# Kun /tmp er skrivbar, og tråde og processer fryses, når svaret er sendt:
+# forældede medier hentes synkront, analyser køres i den kaldende tråd, og
+# jobtilstand (/api/jobs og ?mode=job) er slået fra
+STATE_DIR = os.path.join(tempfile.gettempdir(), 'mediekompasset')
+os.environ.setdefault('CRAWL_BACKGROUND', '0')
+os.environ.setdefault('ANALYZE_PROCESS_WORKERS', '0')
+os.environ.setdefault('JOBS_ENABLED', '0')
+os.environ.setdefault('ANALYSIS_CACHE_PATH', os.path.join(STATE_DIR, 'analysis_cache.sqlite3'))
+os.environ.setdefault('ARTICLE_STORE_PATH', os.path.join(STATE_DIR, 'articles.sqlite3'))
+os.environ.setdefault('AGGREGATE_PATH', os.path.join(STATE_DIR, 'aggregates.json'))
+os.environ.setdefault('JOB_QUEUE_PATH', os.path.join(STATE_DIR, 'jobs.sqlite3'))
+os.environ.setdefault('KEYWORDS_DF_PATH', os.path.join(STATE_DIR, 'doc_freq.json'))
+os.environ.setdefault('CRAWL_SNAPSHOT_PATH', os.path.join(STATE_DIR, 'snapshot.json'))
+os.makedirs(STATE_DIR, exist_ok=True)
+
+from app import app, warm_up  # noqa: E402
+
+if os.getenv('SERVERLESS_WARM_UP', '1') == '1':
+    warm_up(nlp=os.getenv('SERVERLESS_WARM_NLP', '1') == '1')
+
+# Nogle WSGI-værter leder efter navnet application
+application = app
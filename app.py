@@ -1,22 +1,49 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-from newspaper import Article
-import nltk
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import datetime, timezone
 import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
 
-# Download necessary NLTK data
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
-nltk.download('maxent_ne_chunker')
-nltk.download('words')
+load_dotenv()
+
+from aggregates import Aggregator
+import crawler
+from analysis import analyze_article, analyze_many, prepare as prepare_analysis
+from analysis_cache import AnalysisCache
+from article_store import ArticleStore
+from feeds import extract_entries
+from jobs import JobQueue, QueueFull
+from linkextract import extract_links
+import metrics
+from profiler import ProfileStore, Sampler
+from records import SOURCE_IDS, Link, columnar, columnar_links
+from responses import (
+    JSONProvider, compress_response, decode_cursor, encode_cursor, page_limit, paginate, parse_limit
+)
+from stats import StatsPayload, load_media_stats
+from stories import StoryIndex
+from urltools import HostIndex, canonicalize_url, clean_url, validate_url
+import scraper
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 CORS(app)
 
+ANALYZE_BATCH_MAX = int(os.getenv('ANALYZE_BATCH_MAX', '50'))
+# Headeren X-Profile: 1 profilerer en request, hvis det er slået til
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', '0') == '1'
+# Jobtilstand kræver arbejdstråde der lever videre efter svaret (ikke serverless)
+JOBS_ENABLED = os.getenv('JOBS_ENABLED', '1') == '1'
+
+# Analyser caches i hukommelsen og i en SQLite-fil under instance/
+analysis_cache = AnalysisCache(
+    os.getenv('ANALYSIS_CACHE_PATH', os.path.join(app.instance_path, 'analysis_cache.sqlite3'))
+)
+
 # Liste over medier vi følger
 MEDIA_SOURCES = {
     # Landsdækkende dagblade
@@ -58,6 +85,18 @@ MEDIA_SOURCES = {
     'Sjællandske Medier': 'https://www.sjaellandsposten.dk'
 }
 
+# RSS/Atom-feeds og nyheds-sitemaps pr. medie; de prøves i rækkefølge før
+# forsiden, som kun hentes hvis ingen af dem giver artikler
+MEDIA_FEEDS = {
+    'Berlingske': ['https://www.berlingske.dk/content/rss'],
+    'Politiken': ['https://politiken.dk/rss/senestenyt.rss'],
+    'Information': ['https://www.information.dk/feed'],
+    'DR': ['https://www.dr.dk/nyheder/service/feeds/allenyheder'],
+    'TV2': ['https://feeds.services.tv2.dk/api/feeds/nyheder/rss'],
+    'BT': ['https://www.bt.dk/bt/seneste/rss'],
+    'Ekstra Bladet': ['https://ekstrabladet.dk/rssfeed/all/']
+}
+
 # Kategorisering af medier
 MEDIA_CATEGORIES = {
     'Landsdækkende': ['Berlingske', 'Politiken', 'Information', 'Kristeligt Dagblad', 'Jyllands-Posten'],
@@ -68,519 +107,445 @@ MEDIA_CATEGORIES = {
     'Regional': ['TV2 Nord', 'TV2 Øst', 'TV2 Fyn', 'TV2 Lorry', 'Nordjyske', 'TV MIDTVEST', 'TV SYD', 'TV2 Østjylland', 'JydskeVestkysten', 'Fyens Stiftstidende', 'Århus Stiftstidende', 'Sjællandske Medier']
 }
 
-def analyze_article(url):
-    """Analyserer en enkelt artikel"""
+# Domæne -> medie, så links kan tilskrives med ét opslag
+host_index = HostIndex(MEDIA_SOURCES)
+
+# Links gemmer mediet som et id, der er dets indeks i MEDIA_SOURCES
+SOURCE_IDS.register(MEDIA_SOURCES)
+
+# Alle skrabede links og analyser gemmes og kan søges via /api/articles
+article_store = ArticleStore(
+    os.getenv('ARTICLE_STORE_PATH', os.path.join(app.instance_path, 'articles.sqlite3')),
+    MEDIA_CATEGORIES
+)
+
+# Løbende tal pr. medie og kategori, som flettes ind i /api/stats
+aggregator = Aggregator(
+    MEDIA_CATEGORIES,
+    os.getenv('AGGREGATE_PATH', os.path.join(app.instance_path, 'aggregates.json'))
+)
+
+# Artikler om samme historie grupperes på tværs af medier (genopbygges fra artikellageret)
+story_index = StoryIndex(article_store.analyzed_since)
+metrics.REGISTRY.gauge(
+    'mediekompasset_stories', 'Historier i indekset over dækning på tværs af medier',
+    lambda: len(story_index)
+)
+
+# Profiler fra X-Profile-requests kan hentes via /api/profiles/<id>
+profiles = ProfileStore()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_REQUESTS and request.headers.get('X-Profile') == '1':
+        g.sampler = Sampler(threading.get_ident()).start()
+
+@app.after_request
+def record_request(response):
+    """Registrerer svartiden pr. route og gemmer en eventuel profil"""
+    route = request.url_rule.rule if request.url_rule else 'ukendt'
+    metrics.REQUEST_SECONDS.observe(
+        time.perf_counter() - g.request_started,
+        route=route, method=request.method, status=str(response.status_code)
+    )
+    sampler = g.pop('sampler', None)
+    if sampler is not None:
+        response.headers['X-Profile-Id'] = profiles.add(sampler.stop().collapsed())
+    return response
+
+@app.after_request
+def compress_json(response):
+    """Komprimerer store JSON-svar med brotli eller gzip (se responses.py)"""
+    return compress_response(response, request.accept_encodings)
+
+@app.route('/api', methods=['GET'])
+def home():
+    """Sundhedstjek (samme svar som den tidligere serverless-indgang)"""
+    return jsonify({"status": "API is running"})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Tællere og histogrammer i Prometheus' tekstformat"""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Returnerer en gemt profil i collapsed stack-format"""
+    profile = profiles.get(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profilen findes ikke'}), 404
+    return Response(profile, mimetype='text/plain')
+
+def store_links(links):
+    """Gemmer skrabede links (Link-poster); fejl i lageret må ikke stoppe skrabningen"""
     try:
-        article = Article(url)
-        article.download()
-        article.parse()
-        article.nlp()
-        
-        # Grundlæggende analyse
-        text = article.text
-        title = article.title
-        publish_date = article.publish_date
-        
-        # Simpel sentiment analyse baseret på nøgleord
-        positive_words = ['god', 'positiv', 'succes', 'fremgang', 'vækst']
-        negative_words = ['dårlig', 'negativ', 'fiasko', 'nedgang', 'krise']
-        
-        words = text.lower().split()
-        positive_count = sum(1 for word in words if word in positive_words)
-        negative_count = sum(1 for word in words if word in negative_words)
-        
-        total = positive_count + negative_count
-        if total > 0:
-            sentiment_score = (positive_count - negative_count) / total
-        else:
-            sentiment_score = 0
-            
-        sentiment = {
-            'label': 'positiv' if sentiment_score > 0 else 'negativ',
-            'score': abs(sentiment_score)
-        }
-        
-        # Kilde analyse
-        sources = len(article.quotes)
-        
-        return {
-            'title': title,
-            'publish_date': publish_date,
-            'sentiment': sentiment,
-            'sources_count': sources,
-            'keywords': article.keywords,
-            'summary': article.summary
-        }
-    except Exception as e:
-        return {'error': str(e)}
+        article_store.add_links(link.to_dict() for link in links)
+    except sqlite3.Error as e:
+        print(f"Kunne ikke gemme links: {str(e)}")
+
+def store_analyses(analyses):
+    """Gemmer (url, analyse)-par der ikke fejlede og tæller nye artikler med i aggregaterne"""
+    rows = [
+        (url, host_index.lookup(url), analysis)
+        for url, analysis in analyses if 'error' not in analysis
+    ]
+    try:
+        new_rows = article_store.add_analyses(rows)
+    except sqlite3.Error as e:
+        print(f"Kunne ikke gemme analyser: {str(e)}")
+        return
+    for url, source, analysis in new_rows:
+        aggregator.add(source, analysis)
+        story_index.add(url, source, analysis)
+
+def analyze_and_store(url):
+    """Analyserer en artikel og gemmer resultatet i artikellageret"""
+    analysis = analyze_article(url)
+    store_analyses([(url, analysis)])
+    return analysis
+
+def analyze_cached(url):
+    """Analyse fra cachen, ellers analyseres og gemmes artiklen"""
+    return analysis_cache.get_or_compute(url, analyze_and_store)
+
+# Analyser i jobtilstand køres af en begrænset pulje og overlever genstart
+job_queue = JobQueue(
+    analyze_cached,
+    os.getenv('JOB_QUEUE_PATH', os.path.join(app.instance_path, 'jobs.sqlite3'))
+)
+
+@app.before_request
+def resume_jobs():
+    # Job der blev accepteret før en genstart, køres videre ved første request
+    if JOBS_ENABLED:
+        job_queue.start()
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_media():
     """Endpoint til at analysere medier"""
-    url = request.json.get('url')
-    if not url:
-        return jsonify({'error': 'URL er påkrævet'}), 400
-    
-    analysis = analyze_article(url)
+    if request.args.get('mode') == 'job':
+        return submit_job()
+    body = request.get_json(silent=True)
+    try:
+        url = validate_url(body.get('url') if isinstance(body, dict) else None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    analysis = analyze_cached(url)
     return jsonify(analysis)
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Lægger en analyse i kø og returnerer straks jobbet (202)"""
+    if not JOBS_ENABLED:
+        return jsonify({'error': 'Jobtilstand er slået fra; brug /api/analyze uden mode=job'}), 503
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    try:
+        url = validate_url(body.get('url'))
+        job = job_queue.submit(url, body.get('priority', 'interactive'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFull as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    response = jsonify(job)
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status og resultat for et job; ?wait=sekunder venter på at det bliver færdigt"""
+    try:
+        job = job_queue.get(job_id, wait=request.args.get('wait', 0, type=float))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if job is None:
+        return jsonify({'error': 'Jobbet findes ikke'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs', methods=['GET'])
+def get_job_stats():
+    """Antal job pr. status"""
+    return jsonify(job_queue.stats())
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyserer flere artikler og streamer resultaterne som NDJSON"""
+    urls = (request.get_json(silent=True) or {}).get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) and u for u in urls):
+        return jsonify({'error': 'En liste af URL\'er er påkrævet'}), 400
+    if len(urls) > ANALYZE_BATCH_MAX:
+        return jsonify({'error': f'Højst {ANALYZE_BATCH_MAX} URL\'er pr. kald'}), 400
+
+    def generate():
+        uncached = []
+        seen = set()
+        for url in dict.fromkeys(urls):
+            # En ugyldig URL giver en fejl for netop den og stopper ikke resten
+            try:
+                validate_url(url)
+            except ValueError as e:
+                yield app.json.dumps({'error': str(e), 'url': url}) + '\n'
+                continue
+            # Samme artikel med fx tracking-parametre analyseres kun én gang
+            key = canonicalize_url(url)
+            if key in seen:
+                continue
+            seen.add(key)
+            cached = analysis_cache.get(url)
+            if cached is None:
+                uncached.append(url)
+            else:
+                yield app.json.dumps(dict(cached, url=url)) + '\n'
+        completed = []
+        try:
+            for url, analysis in analyze_many(uncached):
+                completed.append((url, analysis))
+                if 'error' not in analysis:
+                    analysis = analysis_cache.put(url, analysis)
+                yield app.json.dumps(dict(analysis, url=url)) + '\n'
+        finally:
+            # Også når klienten afbryder, gemmes de analyser der nåede at blive færdige
+            store_analyses(completed)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/analyze/cache', methods=['GET'])
+def get_analysis_cache_stats():
+    """Returnerer hit/miss-tællere for analysecachen"""
+    return jsonify(analysis_cache.stats())
+
+@app.route('/api/analyze/cache', methods=['DELETE'])
+def invalidate_analysis_cache():
+    """Fjerner en URL (eller hele cachen) fra analysecachen"""
+    body = request.get_json(silent=True)
+    url = request.args.get('url') or (body.get('url') if isinstance(body, dict) else None)
+    if url is not None:
+        try:
+            validate_url(url)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    removed = analysis_cache.invalidate(url)
+    return jsonify({'removed': removed})
+
+def extract_articles(source, url, chunks, kind='html'):
+    """Finder artikellinks på en forside eller i et feed (kind='feed'), mens det streames"""
+    seen = set()
+
+    def is_article_link(href):
+        # Kun links til et fulgt medie og ikke blot til en forside
+        if host_index.lookup(href) is None or urlsplit(href).path in ('', '/'):
+            return False
+        key = canonicalize_url(href)
+        if key in seen:
+            return False
+        seen.add(key)
+        return True
+
+    if kind == 'feed':
+        links = extract_entries(chunks, url, accept=is_article_link, limit=10)
+    else:
+        links = extract_links(chunks, url, accept=is_article_link, limit=10)
+    # Feeds har en pålidelig udgivelsesdato; det har links fra forsiden ikke
+    articles = [
+        Link(host_index.lookup(link['url']), clean_url(link['url']), link['title'], link.get('published'))
+        for link in links
+    ]
+    store_links(articles)
+    return articles
+
+# Forsiderne hentes i baggrunden; /api/latest serverer seneste snapshot
+latest_crawler = crawler.SnapshotCrawler(MEDIA_SOURCES, extract_articles, feeds=MEDIA_FEEDS)
+
 @app.route('/api/latest', methods=['GET'])
 def get_latest_articles():
     """Henter de seneste artikler fra alle medier"""
+    latest_crawler.start()
+
+    # ?stream=ndjson|sse sender hvert medie, så snart det er klar
+    stream = request.args.get('stream')
+    if stream is None and request.accept_mimetypes.best == 'text/event-stream':
+        stream = 'sse'
+    if stream is not None:
+        if stream not in ('ndjson', 'sse'):
+            return jsonify({'error': 'stream skal være ndjson eller sse'}), 400
+        return stream_latest_articles(stream)
+
+    results, status = latest_crawler.snapshot()
+    limit = parse_limit(request.args.get('limit'))
+    try:
+        payload, headers = latest_payload(
+            results, status, bool(request.args.get('details')),
+            columnar=request.args.get('format') == 'columnar',
+            limit=limit, cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify(payload)
+    response.headers.update(headers)
+    return response
+
+def latest_payload(results, status, details, columnar=False, limit=None, cursor=None):
+    """Samler snapshot pr. medie til svaret fra /api/latest; returnerer (data, headers).
+
+    Med columnar gives artiklerne i kolonneformat (se records.columnar) i
+    stedet for som en liste af objekter. Med limit eller cursor pagineres
+    listen, og svaret får next_cursor; en ugyldig cursor giver ValueError.
+    """
+    # Samme artikel kan være linket fra flere forsider
     articles = []
-    for source, url in MEDIA_SOURCES.items():
+    seen = set()
+    for source in MEDIA_SOURCES:
+        for article in results.get(source, []):
+            key = canonicalize_url(article.url)
+            if key not in seen:
+                seen.add(key)
+                articles.append((key, article))
+    paginated = limit is not None or bool(cursor)
+    if paginated:
+        articles, next_cursor = paginate(articles, lambda item: item[0], page_limit(limit), cursor)
+    articles = [article for _, article in articles]
+    articles = columnar_links(articles) if columnar else [article.to_dict() for article in articles]
+
+    # ?details=1 giver status pr. kilde; standard er den rene liste
+    if details:
+        payload = {
+            'articles': articles,
+            'sources': status,
+            'partial': any(s['status'] != 'ok' for s in status.values())
+        }
+        if paginated:
+            payload['next_cursor'] = next_cursor
+        return payload, {}
+    ages = [s['age_s'] for s in status.values() if s.get('age_s') is not None]
+    if paginated:
+        articles = {'articles': articles, 'next_cursor': next_cursor}
+    return articles, {'X-Snapshot-Age': str(max(ages))} if ages else {}
+
+def stream_latest_articles(stream):
+    """Streamer artikler pr. medie som NDJSON-linjer eller Server-Sent Events"""
+    def generate():
+        seen = set()
+        for source, source_articles, status in latest_crawler.iter_snapshot():
+            articles = []
+            for article in source_articles:
+                key = canonicalize_url(article.url)
+                if key not in seen:
+                    seen.add(key)
+                    articles.append(article.to_dict())
+            data = app.json.dumps({'source': source, 'articles': articles, 'status': status})
+            if stream == 'sse':
+                yield f'event: source\ndata: {data}\n\n'
+            else:
+                yield data + '\n'
+        if stream == 'sse':
+            yield 'event: done\ndata: {}\n\n'
+
+    mimetype = 'text/event-stream' if stream == 'sse' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Undgå at proxyer som nginx samler svaret op før det sendes videre
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def parse_date_param(name):
+    """Læser en ISO-dato fra query-strengen som epoch-sekunder (UTC hvis uden tidszone)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+@app.route('/api/articles', methods=['GET'])
+def get_articles():
+    """Søger i gemte artikler med filtre og cursor-paginering"""
+    try:
+        articles, next_cursor = article_store.query(
+            source=request.args.get('source'),
+            category=request.args.get('category'),
+            since=parse_date_param('from'),
+            until=parse_date_param('to'),
+            q=request.args.get('q'),
+            limit=request.args.get('limit', 50, type=int),
+            cursor=request.args.get('cursor')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if request.args.get('format') == 'columnar':
+        articles = columnar(articles)
+    return jsonify({'articles': articles, 'next_cursor': next_cursor})
+
+@app.route('/api/stories', methods=['GET'])
+def get_stories():
+    """Historier dækket af flere medier, og hvordan deres sentiment adskiller sig"""
+    min_outlets = max(1, request.args.get('min_outlets', 2, type=int))
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    cursor = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        stories = story_index.stories(min_outlets=min_outlets, limit=limit + 1, after=after)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    next_cursor = encode_cursor(stories[limit - 1]['id']) if len(stories) > limit else None
+    return jsonify({'stories': stories[:limit], 'next_cursor': next_cursor})
+
+@app.route('/api/stories/<story_id>', methods=['GET'])
+def get_story(story_id):
+    """Én historie med alle artikler om den"""
+    story = story_index.get(story_id)
+    if story is None:
+        return jsonify({'error': 'Historien findes ikke'}), 404
+    return jsonify(story)
+
+# Statistikken ligger i data/media_stats.json og kodes én gang ved opstart
+stats_payload = StatsPayload(load_media_stats(), MEDIA_CATEGORIES)
+
+def warm_up(nlp=True):
+    """Gør det tunge arbejde én gang pr. proces, så senere requests genbruger det.
+
+    Opretter forbindelsespuljen, koder standardsvaret fra /api/stats og
+    indlæser (hvis nlp) newspaper og nøgleordsudtrækket. Fejl logges blot; så sker
+    indlæsningen i stedet ved første analyse.
+    """
+    scraper.get_session()
+    stats_payload.refresh_live(aggregator.version, aggregator.summary)
+    stats_payload.encoded()
+    if nlp:
         try:
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            links = soup.find_all('a', href=True)[:10]
-            
-            for link in links:
-                if any(source.lower() in link['href'].lower() for source in MEDIA_SOURCES.keys()):
-                    articles.append({
-                        'source': source,
-                        'url': link['href'],
-                        'title': link.text.strip()
-                    })
+            prepare_analysis()
         except Exception as e:
-            print(f"Fejl ved hentning af {source}: {str(e)}")
-    
-    return jsonify(articles)
+            print(f"Kunne ikke indlæse NLP-ressourcer ved opstart: {str(e)}")
 
 @app.route('/api/stats', methods=['GET'])
 def get_statistics():
     """Henter detaljeret statistik over mediedækning"""
-    return jsonify({
-        'media_stats': {
-            # Landsdækkende
-            'Berlingske': {
-                'political_bias': 0.3,
-                'reliability_score': 0.88,
-                'source_diversity': 0.85,
-                'topic_coverage': {
-                    'politik': 0.30,
-                    'økonomi': 0.25,
-                    'kultur': 0.15,
-                    'udland': 0.15,
-                    'samfund': 0.15
-                },
-                'fact_checking': 0.87,
-                'transparency': 0.86,
-                'category': 'Landsdækkende',
-                'description': 'Konservativ-liberal avis med fokus på politik, erhverv og kultur'
-            },
-            'Politiken': {
-                'political_bias': -0.4,
-                'reliability_score': 0.87,
-                'source_diversity': 0.83,
-                'topic_coverage': {
-                    'politik': 0.25,
-                    'kultur': 0.25,
-                    'samfund': 0.20,
-                    'udland': 0.15,
-                    'klima': 0.15
-                },
-                'fact_checking': 0.88,
-                'transparency': 0.85,
-                'category': 'Landsdækkende',
-                'description': 'Socialliberal avis med fokus på kultur, samfund og politik'
-            },
-            'Information': {
-                'political_bias': -0.6,
-                'reliability_score': 0.85,
-                'source_diversity': 0.82,
-                'topic_coverage': {
-                    'samfund': 0.30,
-                    'klima': 0.20,
-                    'kultur': 0.20,
-                    'udland': 0.15,
-                    'politik': 0.15
-                },
-                'fact_checking': 0.86,
-                'transparency': 0.88,
-                'category': 'Landsdækkende',
-                'description': 'Venstreorienteret nicheavis med fokus på dybdegående analyser'
-            },
-            'Kristeligt Dagblad': {
-                'political_bias': 0.1,
-                'reliability_score': 0.89,
-                'source_diversity': 0.84,
-                'topic_coverage': {
-                    'religion': 0.30,
-                    'etik': 0.25,
-                    'samfund': 0.20,
-                    'kultur': 0.15,
-                    'udland': 0.10
-                },
-                'fact_checking': 0.89,
-                'transparency': 0.87,
-                'category': 'Landsdækkende',
-                'description': 'Værdiorienteret avis med fokus på religion, etik og eksistens'
-            },
-            'Jyllands-Posten': {
-                'political_bias': 0.2,
-                'reliability_score': 0.86,
-                'source_diversity': 0.85,
-                'topic_coverage': {
-                    'politik': 0.25,
-                    'økonomi': 0.25,
-                    'udland': 0.20,
-                    'samfund': 0.15,
-                    'kultur': 0.15
-                },
-                'fact_checking': 0.85,
-                'transparency': 0.84,
-                'category': 'Landsdækkende',
-                'description': 'Liberal-konservativ avis med fokus på politik og erhverv'
-            },
-            
-            # Public Service
-            'DR': {
-                'political_bias': -0.1,
-                'reliability_score': 0.90,
-                'source_diversity': 0.88,
-                'topic_coverage': {
-                    'politik': 0.20,
-                    'samfund': 0.20,
-                    'kultur': 0.20,
-                    'udland': 0.20,
-                    'regional': 0.20
-                },
-                'fact_checking': 0.91,
-                'transparency': 0.89,
-                'category': 'Public Service',
-                'description': 'Public service medie med bred dækning af alle samfundsområder'
-            },
-            'TV2': {
-                'political_bias': 0.0,
-                'reliability_score': 0.88,
-                'source_diversity': 0.86,
-                'topic_coverage': {
-                    'politik': 0.25,
-                    'samfund': 0.25,
-                    'regional': 0.20,
-                    'sport': 0.15,
-                    'underholdning': 0.15
-                },
-                'fact_checking': 0.87,
-                'transparency': 0.86,
-                'category': 'Public Service',
-                'description': 'Kommercielt public service medie med fokus på nyheder og underholdning'
-            },
-            
-            # Tabloid
-            'BT': {
-                'political_bias': 0.2,
-                'reliability_score': 0.75,
-                'source_diversity': 0.72,
-                'topic_coverage': {
-                    'underholdning': 0.30,
-                    'sport': 0.25,
-                    'krimi': 0.20,
-                    'samfund': 0.15,
-                    'politik': 0.10
-                },
-                'fact_checking': 0.76,
-                'transparency': 0.74,
-                'category': 'Tabloid',
-                'description': 'Tabloidavis med fokus på underholdning, sport og breaking news'
-            },
-            'Ekstra Bladet': {
-                'political_bias': -0.2,
-                'reliability_score': 0.72,
-                'source_diversity': 0.70,
-                'topic_coverage': {
-                    'underholdning': 0.35,
-                    'krimi': 0.25,
-                    'sport': 0.20,
-                    'politik': 0.10,
-                    'samfund': 0.10
-                },
-                'fact_checking': 0.73,
-                'transparency': 0.71,
-                'category': 'Tabloid',
-                'description': 'Tabloidavis kendt for undersøgende journalistik og underholdning'
-            },
-            
-            # Niche
-            'Altinget': {
-                'political_bias': 0.0,
-                'reliability_score': 0.92,
-                'source_diversity': 0.90,
-                'topic_coverage': {
-                    'politik': 0.60,
-                    'samfund': 0.20,
-                    'eu': 0.10,
-                    'økonomi': 0.05,
-                    'miljø': 0.05
-                },
-                'fact_checking': 0.93,
-                'transparency': 0.91,
-                'category': 'Niche',
-                'description': 'Politisk nichemedie med fokus på Christiansborg og EU'
-            },
-            'Zetland': {
-                'political_bias': -0.3,
-                'reliability_score': 0.89,
-                'source_diversity': 0.87,
-                'topic_coverage': {
-                    'samfund': 0.35,
-                    'kultur': 0.25,
-                    'klima': 0.20,
-                    'teknologi': 0.10,
-                    'videnskab': 0.10
-                },
-                'fact_checking': 0.90,
-                'transparency': 0.92,
-                'category': 'Niche',
-                'description': 'Digitalt medie med fokus på dybdegående journalistik'
-            },
-            
-            # Erhverv
-            'Børsen': {
-                'political_bias': 0.4,
-                'reliability_score': 0.87,
-                'source_diversity': 0.85,
-                'topic_coverage': {
-                    'erhverv': 0.40,
-                    'økonomi': 0.30,
-                    'finans': 0.15,
-                    'politik': 0.10,
-                    'teknologi': 0.05
-                },
-                'fact_checking': 0.88,
-                'transparency': 0.86,
-                'category': 'Erhverv',
-                'description': 'Erhvervsavis med fokus på økonomi, finans og erhvervsliv'
-            },
-            'Finans': {
-                'political_bias': 0.3,
-                'reliability_score': 0.86,
-                'source_diversity': 0.84,
-                'topic_coverage': {
-                    'erhverv': 0.35,
-                    'økonomi': 0.35,
-                    'finans': 0.15,
-                    'politik': 0.10,
-                    'teknologi': 0.05
-                },
-                'fact_checking': 0.87,
-                'transparency': 0.85,
-                'category': 'Erhverv',
-                'description': 'Digital erhvervsavis med fokus på erhverv og økonomi'
-            },
-            'MediaWatch': {
-                'political_bias': 0.0,
-                'reliability_score': 0.88,
-                'source_diversity': 0.86,
-                'topic_coverage': {
-                    'medier': 0.60,
-                    'tech': 0.15,
-                    'reklame': 0.10,
-                    'erhverv': 0.10,
-                    'politik': 0.05
-                },
-                'fact_checking': 0.89,
-                'transparency': 0.87,
-                'category': 'Erhverv',
-                'description': 'Branchemedie med fokus på medie- og reklamebranchen'
-            },
-            
-            # Regionale medier
-            'TV2 Nord': {
-                'political_bias': 0.0,
-                'reliability_score': 0.85,
-                'source_diversity': 0.82,
-                'topic_coverage': {
-                    'lokalt': 0.45,
-                    'samfund': 0.20,
-                    'kultur': 0.15,
-                    'erhverv': 0.10,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.84,
-                'transparency': 0.85,
-                'category': 'Regional',
-                'description': 'Regional TV2-kanal der dækker Nordjylland'
-            },
-            'TV2 Øst': {
-                'political_bias': 0.1,
-                'reliability_score': 0.84,
-                'source_diversity': 0.81,
-                'topic_coverage': {
-                    'lokalt': 0.45,
-                    'samfund': 0.20,
-                    'kultur': 0.15,
-                    'erhverv': 0.10,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.83,
-                'transparency': 0.84,
-                'category': 'Regional',
-                'description': 'Regional TV2-kanal der dækker Sjælland og øerne'
-            },
-            'TV2 Fyn': {
-                'political_bias': -0.1,
-                'reliability_score': 0.85,
-                'source_diversity': 0.83,
-                'topic_coverage': {
-                    'lokalt': 0.45,
-                    'samfund': 0.20,
-                    'kultur': 0.15,
-                    'erhverv': 0.10,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.84,
-                'transparency': 0.85,
-                'category': 'Regional',
-                'description': 'Regional TV2-kanal der dækker Fyn og øerne'
-            },
-            'TV2 Lorry': {
-                'political_bias': -0.1,
-                'reliability_score': 0.86,
-                'source_diversity': 0.84,
-                'topic_coverage': {
-                    'lokalt': 0.40,
-                    'samfund': 0.25,
-                    'kultur': 0.15,
-                    'erhverv': 0.10,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.85,
-                'transparency': 0.86,
-                'category': 'Regional',
-                'description': 'Regional TV2-kanal der dækker hovedstadsområdet'
-            },
-            'TV MIDTVEST': {
-                'political_bias': 0.1,
-                'reliability_score': 0.84,
-                'source_diversity': 0.82,
-                'topic_coverage': {
-                    'lokalt': 0.45,
-                    'samfund': 0.20,
-                    'kultur': 0.15,
-                    'erhverv': 0.10,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.83,
-                'transparency': 0.84,
-                'category': 'Regional',
-                'description': 'Regional TV2-kanal der dækker Midt- og Vestjylland'
-            },
-            'TV SYD': {
-                'political_bias': 0.1,
-                'reliability_score': 0.85,
-                'source_diversity': 0.82,
-                'topic_coverage': {
-                    'lokalt': 0.45,
-                    'samfund': 0.20,
-                    'kultur': 0.15,
-                    'erhverv': 0.10,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.84,
-                'transparency': 0.85,
-                'category': 'Regional',
-                'description': 'Regional TV2-kanal der dækker Syd- og Sønderjylland'
-            },
-            'TV2 Østjylland': {
-                'political_bias': 0.0,
-                'reliability_score': 0.85,
-                'source_diversity': 0.83,
-                'topic_coverage': {
-                    'lokalt': 0.45,
-                    'samfund': 0.20,
-                    'kultur': 0.15,
-                    'erhverv': 0.10,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.84,
-                'transparency': 0.85,
-                'category': 'Regional',
-                'description': 'Regional TV2-kanal der dækker Østjylland'
-            },
-            'Nordjyske': {
-                'political_bias': 0.2,
-                'reliability_score': 0.83,
-                'source_diversity': 0.80,
-                'topic_coverage': {
-                    'lokalt': 0.40,
-                    'samfund': 0.20,
-                    'erhverv': 0.15,
-                    'kultur': 0.15,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.82,
-                'transparency': 0.83,
-                'category': 'Regional',
-                'description': 'Regional avis der dækker Nordjylland'
-            },
-            'JydskeVestkysten': {
-                'political_bias': 0.2,
-                'reliability_score': 0.84,
-                'source_diversity': 0.81,
-                'topic_coverage': {
-                    'lokalt': 0.40,
-                    'samfund': 0.20,
-                    'erhverv': 0.15,
-                    'kultur': 0.15,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.83,
-                'transparency': 0.84,
-                'category': 'Regional',
-                'description': 'Regional avis der dækker Syd- og Sønderjylland'
-            },
-            'Fyens Stiftstidende': {
-                'political_bias': 0.1,
-                'reliability_score': 0.84,
-                'source_diversity': 0.81,
-                'topic_coverage': {
-                    'lokalt': 0.40,
-                    'samfund': 0.20,
-                    'erhverv': 0.15,
-                    'kultur': 0.15,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.83,
-                'transparency': 0.84,
-                'category': 'Regional',
-                'description': 'Regional avis der dækker Fyn og øerne'
-            },
-            'Århus Stiftstidende': {
-                'political_bias': 0.1,
-                'reliability_score': 0.84,
-                'source_diversity': 0.81,
-                'topic_coverage': {
-                    'lokalt': 0.40,
-                    'samfund': 0.20,
-                    'erhverv': 0.15,
-                    'kultur': 0.15,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.83,
-                'transparency': 0.84,
-                'category': 'Regional',
-                'description': 'Regional avis der dækker Østjylland'
-            },
-            'Sjællandske Medier': {
-                'political_bias': 0.1,
-                'reliability_score': 0.83,
-                'source_diversity': 0.80,
-                'topic_coverage': {
-                    'lokalt': 0.40,
-                    'samfund': 0.20,
-                    'erhverv': 0.15,
-                    'kultur': 0.15,
-                    'sport': 0.10
-                },
-                'fact_checking': 0.82,
-                'transparency': 0.83,
-                'category': 'Regional',
-                'description': 'Regional mediegruppe der dækker Sjælland'
-            }
-        },
-        'categories': MEDIA_CATEGORIES
-    })
+    stats_payload.refresh_live(aggregator.version, aggregator.summary)
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    try:
+        encoded = stats_payload.encoded(request.args.get('category') or None, fields or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    use_gzip = request.accept_encodings['gzip'] > 0
+    if request.if_none_match.contains(encoded.etag) or request.if_none_match.contains(encoded.gzip_etag):
+        response = Response(status=304)
+    elif use_gzip:
+        response = Response(encoded.gzip_body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(encoded.body, mimetype='application/json')
+    response.set_etag(encoded.gzip_etag if use_gzip else encoded.etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,290 @@
+"""Vedvarende lager for indsamlede og analyserede artikler (SQLite med FTS5)"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from urltools import canonicalize_url
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url_key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    source TEXT,
+    category TEXT,
+    title TEXT,
+    summary TEXT,
+    keywords TEXT,
+    sentiment_label TEXT,
+    sentiment_score REAL,
+    sources_count INTEGER,
+    publish_date TEXT,
+    first_seen REAL NOT NULL,
+    analyzed_at REAL
+);
+CREATE INDEX IF NOT EXISTS articles_seen ON articles (first_seen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS articles_source_seen ON articles (source, first_seen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS articles_analyzed ON articles (analyzed_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, summary, keywords,
+    content='articles', content_rowid='id', tokenize='unicode61 remove_diacritics 0'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, summary, keywords)
+    VALUES (new.id, new.title, new.summary, new.keywords);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, summary, keywords)
+    VALUES ('delete', old.id, old.title, old.summary, old.keywords);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE OF title, summary, keywords ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, summary, keywords)
+    VALUES ('delete', old.id, old.title, old.summary, old.keywords);
+    INSERT INTO articles_fts (rowid, title, summary, keywords)
+    VALUES (new.id, new.title, new.summary, new.keywords);
+END;
+'''
+
+# Oprettes efter at ældre lagre har fået kolonnen category (se _migrate)
+CATEGORY_INDEX = (
+    'CREATE INDEX IF NOT EXISTS articles_category_seen ON articles (category, first_seen DESC, id DESC)'
+)
+
+COLUMNS = (
+    'id, url, source, title, summary, keywords, sentiment_label, sentiment_score, '
+    'sources_count, publish_date, first_seen, analyzed_at'
+)
+MAX_LIMIT = 200
+
+
+def _to_iso(value):
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _epoch_to_iso(value):
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat()
+
+
+def encode_cursor(first_seen, row_id):
+    raw = json.dumps([first_seen, row_id]).encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Afkoder en cursor; kaster ValueError hvis den er ugyldig"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        first_seen, row_id = json.loads(raw)
+        return float(first_seen), int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError('Ugyldig cursor') from e
+
+
+def fts_query(text):
+    """Gør fritekst til en sikker FTS5-forespørgsel: alle ord skal forekomme"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"' for term in terms if term)
+
+
+class ArticleStore:
+    """Artikellager i SQLite (WAL) med fuldtekstindeks over titel, resumé og nøgleord.
+
+    Hver tråd får sin egen forbindelse; skrivninger serialiseres med en lås og
+    sker i bulk.
+    """
+
+    def __init__(self, path, categories=None):
+        self.path = path
+        self.source_category = {
+            source: category
+            for category, sources in (categories or {}).items()
+            for source in sources
+        }
+        self.categories = categories or {}
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        db = self._connection()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(SCHEMA)
+        self._migrate(db)
+
+    def _migrate(self, db):
+        """Tilføjer category til ældre lagre og sætter den ud fra den aktuelle inddeling.
+
+        Kategorien gemmes pr. artikel, så ?category= kan bruge et indeks i
+        stedet for at sortere alle kategoriens artikler.
+        """
+        columns = {row[1] for row in db.execute('PRAGMA table_info(articles)')}
+        with db:
+            if 'category' not in columns:
+                db.execute('ALTER TABLE articles ADD COLUMN category TEXT')
+            db.executemany(
+                'UPDATE articles SET category = ? WHERE source = ? AND category IS NOT ?',
+                [(category, source, category) for source, category in self.source_category.items()]
+            )
+            db.execute(CATEGORY_INDEX)
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def add_links(self, links):
+        """Gemmer skrabede links ({'source', 'url', 'title', 'published'}); kendte URL'er springes over"""
+        now = time.time()
+        rows = [
+            (canonicalize_url(link['url']), link['url'], link.get('source'),
+             self.source_category.get(link.get('source')), link.get('title'), link.get('published'), now)
+            for link in links
+        ]
+        if not rows:
+            return
+        with self._write_lock:
+            db = self._connection()
+            with db:
+                db.executemany(
+                    'INSERT INTO articles (url_key, url, source, category, title, publish_date, first_seen) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url_key) DO NOTHING',
+                    rows
+                )
+
+    def add_analyses(self, analyses):
+        """Gemmer analyser som (url, kilde, analyse); opdaterer eksisterende artikler.
+
+        Returnerer de (url, kilde, analyse) der ikke var analyseret før.
+        """
+        analyses = list(analyses)
+        now = time.time()
+        rows = []
+        for url, source, analysis in analyses:
+            sentiment = analysis.get('sentiment') or {}
+            rows.append((
+                canonicalize_url(url), url, source, self.source_category.get(source),
+                analysis.get('title'), analysis.get('summary'),
+                json.dumps(analysis.get('keywords') or [], ensure_ascii=False),
+                sentiment.get('label'), sentiment.get('score'), analysis.get('sources_count'),
+                _to_iso(analysis.get('publish_date')), now, now
+            ))
+        if not rows:
+            return []
+        with self._write_lock:
+            db = self._connection()
+            with db:
+                keys = [row[0] for row in rows]
+                analyzed = {
+                    key for (key,) in db.execute(
+                        f'SELECT url_key FROM articles WHERE analyzed_at IS NOT NULL '
+                        f'AND url_key IN ({", ".join("?" * len(keys))})',
+                        keys
+                    )
+                }
+                db.executemany(
+                    'INSERT INTO articles (url_key, url, source, category, title, summary, keywords, '
+                    'sentiment_label, sentiment_score, sources_count, publish_date, first_seen, analyzed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (url_key) DO UPDATE SET '
+                    'source = COALESCE(excluded.source, articles.source), '
+                    'category = CASE WHEN excluded.source IS NULL THEN articles.category '
+                    'ELSE excluded.category END, '
+                    'title = COALESCE(excluded.title, articles.title), '
+                    'summary = excluded.summary, keywords = excluded.keywords, '
+                    'sentiment_label = excluded.sentiment_label, sentiment_score = excluded.sentiment_score, '
+                    'sources_count = excluded.sources_count, publish_date = excluded.publish_date, '
+                    'analyzed_at = excluded.analyzed_at',
+                    rows
+                )
+        return [item for item, row in zip(analyses, rows) if row[0] not in analyzed]
+
+    def _row_to_dict(self, row):
+        (row_id, url, source, title, summary, keywords, sentiment_label, sentiment_score,
+         sources_count, publish_date, first_seen, analyzed_at) = row
+        return {
+            'id': row_id,
+            'url': url,
+            'source': source,
+            'category': self.source_category.get(source),
+            'title': title,
+            'summary': summary,
+            'keywords': json.loads(keywords) if keywords else [],
+            'sentiment': (
+                {'label': sentiment_label, 'score': sentiment_score}
+                if sentiment_label is not None else None
+            ),
+            'sources_count': sources_count,
+            'publish_date': publish_date,
+            'first_seen': _epoch_to_iso(first_seen),
+            'analyzed_at': _epoch_to_iso(analyzed_at)
+        }
+
+    def query(self, source=None, category=None, since=None, until=None, q=None,
+              limit=50, cursor=None):
+        """Søger artikler, nyeste først, med cursor-baseret paginering.
+
+        since/until er epoch-sekunder for hvornår artiklen først blev set.
+        Returnerer (artikler, næste cursor eller None). Kaster ValueError ved
+        ukendt kategori eller ugyldig cursor.
+        """
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        where = []
+        params = []
+        if source:
+            where.append('a.source = ?')
+            params.append(source)
+        if category:
+            if category not in self.categories:
+                raise ValueError(f'Ukendt kategori: {category}')
+            where.append('a.category = ?')
+            params.append(category)
+        if since is not None:
+            where.append('a.first_seen >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('a.first_seen < ?')
+            params.append(until)
+        if cursor:
+            first_seen, row_id = decode_cursor(cursor)
+            where.append('(a.first_seen < ? OR (a.first_seen = ? AND a.id < ?))')
+            params.extend([first_seen, first_seen, row_id])
+
+        sql = f'SELECT {", ".join("a." + c.strip() for c in COLUMNS.split(","))} FROM articles a'
+        if q:
+            match = fts_query(q)
+            if match:
+                sql += ' JOIN articles_fts ON articles_fts.rowid = a.id'
+                where.insert(0, 'articles_fts MATCH ?')
+                params.insert(0, match)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY a.first_seen DESC, a.id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        rows = self._connection().execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[10], last[0])
+        return [self._row_to_dict(row) for row in rows], next_cursor
+
+    def analyzed_since(self, since):
+        """Analyserede artikler siden since (epoch) som (url, kilde, analyse, analyseret), ældste først"""
+        rows = self._connection().execute(
+            f'SELECT {COLUMNS} FROM articles WHERE analyzed_at >= ? ORDER BY analyzed_at',
+            (since,)
+        ).fetchall()
+        return [(row[1], row[2], self._row_to_dict(row), row[11]) for row in rows]
@@ -0,0 +1,270 @@
+"""ASGI-udgave af API'et til mange samtidige forbindelser.
+
+/api/latest og /api/analyze håndteres med async handlers, så hentning af
+langsomme medier ikke binder en tråd pr. request; parsing og NLP kører i
+analysens procespulje. Alle andre routes (og streaming, CORS preflight og
+profilering) sendes videre til Flask-appen i en trådpulje, så svarene er de
+samme som i WSGI-udgaven.
+
+Kør med fx:
+    uvicorn asgi:application --workers 2
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.http import parse_accept_header
+
+import aioscraper
+import analysis
+import app as wsgi
+import metrics
+import responses
+from urltools import canonicalize_url, validate_url
+
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '32'))
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi')
+_inflight = {}
+
+
+def _environ(scope, body):
+    """Bygger et WSGI-environ ud fra et ASGI-scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return bytes(body)
+
+
+async def call_wsgi(scope, body, send):
+    """Kører Flask-appen i en tråd og streamer svaret tilbage bid for bid.
+
+    Hele requesten (inkl. streamede generatorer) kører i samme tråd, så
+    Flasks request-kontekst følger med.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def put(item):
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def start_response(status, headers, exc_info=None):
+        put(('start', int(status.split(' ', 1)[0]), headers))
+
+    def run():
+        try:
+            iterable = wsgi.app(_environ(scope, body), start_response)
+            try:
+                for chunk in iterable:
+                    if chunk:
+                        put(('body', chunk))
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        except BaseException as e:
+            put(('error', e))
+        put(('end', None))
+
+    _wsgi_executor.submit(run)
+    started = False
+    while True:
+        kind, *item = await queue.get()
+        if kind == 'start':
+            status, headers = item
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            })
+            started = True
+        elif kind == 'body':
+            await send({'type': 'http.response.body', 'body': item[0], 'more_body': True})
+        elif kind == 'error':
+            print(f"Fejl i WSGI-app: {str(item[0])}")
+            if not started:
+                await send_json(send, 500, {'error': 'Intern fejl'})
+                return
+        else:
+            if started:
+                await send({'type': 'http.response.body', 'body': b''})
+            return
+
+
+async def send_json(send, status, payload, headers=None, scope=None):
+    """Sender et JSON-svar kodet og komprimeret som Flasks jsonify (se responses.py)"""
+    body = responses.dumps(payload) + b'\n'
+    raw_headers = [
+        (b'content-type', b'application/json'),
+        (b'access-control-allow-origin', b'*'),
+        (b'vary', b'Accept-Encoding')
+    ]
+    if scope is not None and len(body) >= responses.JSON_COMPRESS_MIN_BYTES:
+        accept = dict(scope['headers']).get(b'accept-encoding', b'').decode('latin-1')
+        encoding = responses.choose_encoding(parse_accept_header(accept))
+        if encoding is not None:
+            body = responses.compress(body, encoding)
+            raw_headers.append((b'content-encoding', encoding.encode('ascii')))
+    raw_headers.append((b'content-length', str(len(body)).encode('ascii')))
+    raw_headers.extend((k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in (headers or {}).items())
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+    return status
+
+
+async def analyze_url(url):
+    """Henter (async) og analyserer (i procespuljen) en artikel"""
+    try:
+        html = await aioscraper.download_article(url)
+        future = analysis.submit_html(url, html)
+        await asyncio.wait({asyncio.wrap_future(future)})
+        return analysis.result_of(future)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+async def _analyze_and_store(url):
+    result = await analyze_url(url)
+    await asyncio.to_thread(wsgi.store_analyses, [(url, result)])
+    if 'error' not in result:
+        result = await asyncio.to_thread(wsgi.analysis_cache.put, url, result)
+    return result
+
+
+async def analyze_cached(url):
+    """Som analysis_cache.get_or_compute: cache, ellers én fælles analyse pr. URL"""
+    cached = await asyncio.to_thread(wsgi.analysis_cache.get, url)
+    if cached is not None:
+        return cached
+    key = canonicalize_url(url)
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(_analyze_and_store(url))
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: en afbrudt klient må ikke annullere analysen for de andre
+    return await asyncio.shield(task)
+
+
+async def analyze_media(scope, body, send):
+    # Som request.get_json(silent=True): ugyldig JSON og andet end et objekt giver ingen URL
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = None
+    url = payload.get('url') if isinstance(payload, dict) else None
+    try:
+        validate_url(url)
+    except ValueError as e:
+        return await send_json(send, 400, {'error': str(e)})
+    return await send_json(send, 200, await analyze_cached(url), scope=scope)
+
+
+async def get_latest_articles(scope, body, send):
+    wsgi.latest_crawler.start()
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    results, status = await wsgi.latest_crawler.asnapshot(aioscraper.iter_fetch)
+    try:
+        payload, headers = wsgi.latest_payload(
+            results, status, bool(query.get('details', [''])[0]),
+            columnar=query.get('format', [''])[0] == 'columnar',
+            limit=responses.parse_limit(query.get('limit', [''])[0]), cursor=query.get('cursor', [''])[0]
+        )
+    except ValueError as e:
+        return await send_json(send, 400, {'error': str(e)})
+    return await send_json(send, 200, payload, headers, scope)
+
+
+NATIVE_ROUTES = {
+    ('POST', '/api/analyze'): analyze_media,
+    ('GET', '/api/latest'): get_latest_articles
+}
+
+
+def _native_handler(scope):
+    handler = NATIVE_ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        return None
+    headers = {name.lower(): value for name, value in scope['headers']}
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    # Streaming, jobtilstand og profilering klares af Flask-appen
+    if 'stream' in query or 'mode' in query or b'text/event-stream' in headers.get(b'accept', b''):
+        return None
+    if wsgi.PROFILE_REQUESTS and headers.get(b'x-profile') == b'1':
+        return None
+    return handler
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            wsgi.latest_crawler.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aioscraper.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    body = await _read_body(receive)
+    handler = _native_handler(scope)
+    if handler is None:
+        return await call_wsgi(scope, body, send)
+
+    started = time.perf_counter()
+    status = 500
+    try:
+        status = await handler(scope, body, send)
+    finally:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=scope['path'], method=scope['method'], status=str(status)
+        )
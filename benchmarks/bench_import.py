@@ -0,0 +1,89 @@
+"""Måler opstartstiden for app.py (import i en frisk proces).
+
+Eksempler:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --compare baseline   # før/efter mod en git-ref
+    python benchmarks/bench_import.py --max-ms 500         # fejler hvis medianen er over
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = (
+    'import time; started = time.perf_counter(); import {module}; '
+    'print(time.perf_counter() - started)'
+)
+
+
+def measure(cwd, runs, module='app'):
+    """Importerer modulet i en ny proces runs gange og returnerer tider i ms"""
+    env = dict(os.environ, CRAWL_BACKGROUND='0', PYTHONDONTWRITEBYTECODE='1')
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', SNIPPET.format(module=module)],
+            cwd=cwd, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]) * 1000)
+    return timings
+
+
+def summarize(timings):
+    return {
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings), 1),
+        'min_ms': round(min(timings), 1),
+        'max_ms': round(max(timings), 1)
+    }
+
+
+def export_ref(ref, target):
+    """Pakker en git-ref ud i en midlertidig mappe"""
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', ref],
+        cwd=ROOT, check=True, capture_output=True
+    ).stdout
+    path = os.path.join(target, 'archive.tar')
+    with open(path, 'wb') as f:
+        f.write(archive)
+    with tarfile.open(path) as tar:
+        tar.extractall(target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--compare', metavar='REF', help='git-ref at sammenligne med')
+    parser.add_argument('--max-ms', type=float, help='fejl hvis medianen overstiger dette')
+    parser.add_argument('--json', action='store_true', help='skriv resultatet som JSON')
+    args = parser.parse_args()
+
+    results = {'current': summarize(measure(ROOT, args.runs, args.module))}
+    if args.compare:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_ref(args.compare, tmp)
+            results[args.compare] = summarize(measure(tmp, args.runs, args.module))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, summary in results.items():
+            print(f"{name:>12}: median {summary['median_ms']} ms "
+                  f"(min {summary['min_ms']}, max {summary['max_ms']}, {summary['runs']} kørsler)")
+
+    if args.max_ms is not None and results['current']['median_ms'] > args.max_ms:
+        print(f"Opstart er langsommere end {args.max_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Måler kodetid og bytes over nettet for JSON-svarene.
+
+Sammenligner Flasks standardkodning (json med sorterede nøgler) med
+responses.dumps (orjson hvis installeret), og svarstørrelsen ukomprimeret,
+med gzip og med brotli, for /api/stats, /api/latest (som liste og
+?format=columnar) og en side analyser.
+
+Eksempler:
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --links 60 --repeat 20
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.http import http_date  # noqa: E402
+
+import responses  # noqa: E402
+from records import SOURCE_IDS, Link, columnar_links  # noqa: E402
+from stats import load_media_stats  # noqa: E402
+
+
+def flask_default(value):
+    # Som Flasks DefaultJSONProvider før responses.py
+    if isinstance(value, datetime):
+        return http_date(value)
+    raise TypeError(f'Kan ikke serialisere {type(value).__name__}')
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(',', ':'),
+                      default=flask_default).encode('utf-8')
+
+
+def synthetic_links(sources, per_source):
+    links = []
+    for s in range(sources):
+        name = f'Medie {s}'
+        for n in range(per_source):
+            links.append(Link(
+                name, f'https://www.medie{s}.dk/nyheder/2024/artikel-om-dagens-emne-{n}',
+                f'Overskrift nummer {n} om dagens vigtigste nyhed fra medie {s}',
+                f'2024-05-{1 + n % 28:02d}T08:00:00+00:00' if n % 2 else None
+            ))
+    return links
+
+
+def synthetic_analyses(count):
+    published = datetime(2024, 5, 1, 8, 0)
+    return [{
+        'title': f'Overskrift nummer {n} om dagens vigtigste nyhed',
+        'publish_date': published + timedelta(hours=n),
+        'sentiment': {'label': 'negativ' if n % 3 else 'positiv', 'score': round(0.1 + n % 7 / 10, 3)},
+        'sources_count': n % 5,
+        'keywords': ['regeringen', 'folketinget', 'økonomi', 'klima', 'valg'],
+        'summary': 'Første sætning i resuméet.\nAnden sætning i resuméet om sagen.' * 3
+    } for n in range(count)]
+
+
+def measure(func, payload, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(payload)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def sizes(body):
+    result = {'raw': len(body), 'gzip': len(gzip.compress(body, compresslevel=responses.JSON_GZIP_LEVEL))}
+    if responses.brotli is not None:
+        result['br'] = len(responses.compress(body, 'br'))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sources', type=int, default=26, help='antal medier i /api/latest')
+    parser.add_argument('--links', type=int, default=30, help='links pr. medie')
+    parser.add_argument('--analyses', type=int, default=200, help='analyser pr. side')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    links = synthetic_links(args.sources, args.links)
+    SOURCE_IDS.register(f'Medie {s}' for s in range(args.sources))
+    payloads = {
+        '/api/stats': {'media_stats': load_media_stats()},
+        '/api/latest': [link.to_dict() for link in links],
+        '/api/latest?format=columnar': columnar_links(links),
+        'analyser': synthetic_analyses(args.analyses)
+    }
+    print(f'Koder: {"orjson" if responses.orjson is not None else "json"}, '
+          f'brotli: {"ja" if responses.brotli is not None else "nej (pip install brotli)"}')
+    print(f'{"svar":<30}{"json ms":>9}{"ny ms":>9}{"rå":>10}{"gzip":>9}{"br":>9}')
+    for name, payload in payloads.items():
+        old = measure(stdlib_dumps, payload, args.repeat)
+        new = measure(responses.dumps, payload, args.repeat)
+        wire = sizes(responses.dumps(payload))
+        print(f'{name:<30}{old:9.2f}{new:9.2f}{wire["raw"]:10}{wire["gzip"]:9}{wire.get("br", "-"):>9}')
+
+
+if __name__ == '__main__':
+    main()
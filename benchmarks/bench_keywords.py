@@ -0,0 +1,107 @@
+"""Sammenligner det indbyggede nøgleordsudtræk (keywords.py) med newspapers Article.nlp().
+
+Artiklerne parses én gang med newspaper; derefter måles kun udtræk af
+nøgleord og resumé. Uden --file bruges de optagede artikler fra
+benchmarks/fixtures (se standin.py --record) eller syntetiske artikler.
+
+Eksempler:
+    python benchmarks/bench_keywords.py
+    python benchmarks/bench_keywords.py --file artikel.html --file artikel2.html --show
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keywords  # noqa: E402
+from standin import FIXTURES_DIR, synthetic_article  # noqa: E402
+
+
+def load_html(files, count):
+    if not files:
+        files = sorted(glob.glob(os.path.join(FIXTURES_DIR, '*', 'article-*.html')))[:count]
+    if not files:
+        return [synthetic_article('www.example.dk', n) for n in range(count)]
+    pages = []
+    for path in files:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+
+def parse(pages):
+    from newspaper import Article
+
+    articles = []
+    for html in pages:
+        article = Article('https://www.example.dk/artikel')
+        article.download(input_html=html)
+        article.parse()
+        articles.append(article)
+    return articles
+
+
+def run_builtin(article):
+    found, summary, _ = keywords.extract(article.title, article.text)
+    return found, summary
+
+
+def run_newspaper(article):
+    article.nlp()
+    return article.keywords, article.summary
+
+
+def measure(func, articles, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for article in articles:
+            func(article)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000 / len(articles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--file', action='append', help='artikel-HTML (kan gentages)')
+    parser.add_argument('--count', type=int, default=50, help='antal artikler uden --file')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--show', action='store_true', help='vis nøgleord fra begge udtræk')
+    args = parser.parse_args()
+
+    try:
+        articles = parse(load_html(args.file, args.count))
+    except ImportError:
+        sys.exit('newspaper3k er ikke installeret; installer requirements.txt')
+    print(f'Artikler: {len(articles)}, '
+          f'gennemsnitlig længde {sum(len(a.text) for a in articles) // len(articles)} tegn')
+
+    runners = [('builtin', run_builtin)]
+    try:
+        import analysis
+
+        analysis.ensure_nlp_resources()
+        runners.append(('newspaper', run_newspaper))
+    except (ImportError, LookupError) as e:
+        print(f'Springer Article.nlp() over: {str(e)}')
+
+    results = {}
+    for name, func in runners:
+        results[name] = measure(func, articles, args.repeat)
+        print(f'{name:>10}: {results[name]:8.2f} ms pr. artikel')
+    if len(results) == 2:
+        print(f'Hastighed: {results["newspaper"] / results["builtin"]:.1f}x')
+
+    if args.show:
+        for article in articles[:5]:
+            print(f'\n{article.title}')
+            for name, func in runners:
+                print(f'  {name:>10}: {", ".join(func(article)[0])}')
+
+
+if __name__ == '__main__':
+    main()
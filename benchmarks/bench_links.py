@@ -0,0 +1,96 @@
+"""Sammenligner streaming-udtræk af links med fuld BeautifulSoup-parsing.
+
+Eksempler:
+    python benchmarks/bench_links.py                    # syntetisk forside på ~3 MB
+    python benchmarks/bench_links.py --file forside.html --base https://www.dr.dk
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from linkextract import extract_links  # noqa: E402
+
+CHUNK_SIZE = 16 * 1024
+
+
+def synthetic_homepage(size_bytes):
+    """Bygger en forside med navigation, scripts og mange artikellinks"""
+    parts = ['<html><head><title>Forside</title>',
+             '<script>' + 'var x = 1;' * 2000 + '</script></head><body><nav>']
+    parts.extend(f'<a href="/sektion/{i}">Sektion {i}</a>' for i in range(40))
+    parts.append('</nav><main>')
+    size = sum(len(part) for part in parts)
+    n = 0
+    while size < size_bytes:
+        part = (f'<article><a href="/nyheder/artikel-{n}"><h2>Overskrift nummer {n}</h2></a>'
+                f'<p>{"Brødtekst om dagens nyheder. " * 20}</p></article>')
+        parts.append(part)
+        size += len(part)
+        n += 1
+    parts.append('</main></body></html>')
+    return ''.join(parts)
+
+
+def is_article(href):
+    return '/nyheder/' in href
+
+
+def run_streaming(html, base_url, limit):
+    chunks = (html[i:i + CHUNK_SIZE] for i in range(0, len(html), CHUNK_SIZE))
+    return extract_links(chunks, base_url, accept=is_article, limit=limit)
+
+
+def run_soup(html, base_url, limit):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    return [link for link in soup.find_all('a', href=True) if is_article(link['href'])][:limit]
+
+
+def measure(func, html, base_url, limit, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(html, base_url, limit)
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    func(html, base_url, limit)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings) * 1000, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--file', help='optaget forside i stedet for den syntetiske')
+    parser.add_argument('--base', default='https://www.example.dk')
+    parser.add_argument('--size-mb', type=float, default=3)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding='utf-8', errors='replace') as f:
+            html = f.read()
+    else:
+        html = synthetic_homepage(int(args.size_mb * 1024 * 1024))
+    print(f'Side: {len(html) / 1024 / 1024:.1f} MB')
+
+    runners = [('streaming', run_streaming)]
+    try:
+        import bs4  # noqa: F401
+        runners.append(('beautifulsoup', run_soup))
+    except ImportError:
+        print('beautifulsoup4 er ikke installeret; springer sammenligningen over')
+
+    for name, func in runners:
+        elapsed_ms, peak_mb = measure(func, html, args.base, args.limit, args.repeat)
+        print(f'{name:>14}: {elapsed_ms:8.1f} ms, peak {peak_mb:6.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
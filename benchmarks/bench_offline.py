@@ -0,0 +1,305 @@
+"""Belastningstest af API'et mod den lokale stand-in for alle medier.
+
+Appen startes i en separat proces med MEDIA_SOURCES peget over på
+stand-in serveren, så der ikke rammes rigtige danske medier. Hvert endpoint
+belastes med et antal samtidige klienter, og der rapporteres p50/p95/p99,
+gennemløb og maksimal RSS for app-processen. Resultatet gemmes som JSON.
+
+Eksempler:
+    python benchmarks/bench_offline.py --output results.json
+    python benchmarks/bench_offline.py --latency-ms 300 --failure-rate 0.1 --compare results.json
+    python benchmarks/bench_offline.py --endpoints latest --env CRAWL_INTERVAL=0
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standin  # noqa: E402
+
+ENDPOINTS = ('latest', 'analyze', 'stats')
+
+
+def serve_app(port, base_url):
+    """Kører appen (i børneprocessen) med medierne peget over på stand-in serveren"""
+    from werkzeug.serving import make_server
+
+    import app as application
+
+    # Samme dicts bruges af crawleren, så de skal ændres på stedet
+    local_feeds = standin.local_feeds(application.MEDIA_FEEDS, application.MEDIA_SOURCES, base_url)
+    application.MEDIA_SOURCES.update(standin.local_sources(application.MEDIA_SOURCES, base_url))
+    application.MEDIA_FEEDS.clear()
+    if os.environ.get('BENCH_FEEDS', '1') == '1':
+        application.MEDIA_FEEDS.update(local_feeds)
+    server = make_server('127.0.0.1', port, application.app, threaded=True)
+    print('READY', flush=True)
+    server.serve_forever()
+
+
+def rss_bytes(pid):
+    """Nuværende RSS for en proces (Linux /proc, ellers psutil hvis installeret)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return None
+
+
+class RssSampler:
+    """Måler maksimal RSS for en proces mens en fase kører"""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = rss_bytes(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_requests(endpoint, app_url, base_url, sources, count, unique):
+    """Liste af (metode, url, json) for et endpoint"""
+    if endpoint == 'latest':
+        return [('GET', f'{app_url}/api/latest', None)] * count
+    if endpoint == 'stats':
+        return [('GET', f'{app_url}/api/stats', None)] * count
+    slugs = sorted({standin.slug_for(url) for url in sources.values()})
+    articles = standin.ARTICLES_PER_SITE if not unique else count
+    return [
+        ('POST', f'{app_url}/api/analyze',
+         {'url': f'{base_url}/site/{slugs[i % len(slugs)]}/nyheder/{(i // len(slugs)) % articles}'})
+        for i in range(count)
+    ]
+
+
+def failed_items(response):
+    """Antal fejl i et 2xx-svar: et objekt med 'error' eller linjer med 'error' i NDJSON.
+
+    Et svar der ikke kan læses som JSON tæller som én fejl.
+    """
+    try:
+        if 'ndjson' in response.headers.get('Content-Type', ''):
+            items = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+        else:
+            items = [response.json()]
+    except ValueError:
+        return 1
+    return sum(1 for item in items if isinstance(item, dict) and 'error' in item)
+
+
+def run_endpoint(session, requests_list, concurrency, pid):
+    latencies = []
+    status_codes = {}
+    errors = 0
+    body_errors = 0
+    item_errors = 0
+    lock = threading.Lock()
+
+    def call(item):
+        nonlocal errors, body_errors, item_errors
+        method, url, body = item
+        started = time.perf_counter()
+        failed = 0
+        try:
+            response = session.request(method, url, json=body, timeout=120)
+            response.content
+            code = str(response.status_code)
+            if code.startswith('2'):
+                failed = failed_items(response)
+        except Exception:
+            code = 'error'
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            status_codes[code] = status_codes.get(code, 0) + 1
+            if code == 'error' or not code.startswith('2'):
+                errors += 1
+            elif failed:
+                # 200 med en fejl i svaret er ikke et vellykket kald
+                body_errors += 1
+                item_errors += failed
+
+    with RssSampler(pid) as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(call, requests_list))
+        duration = time.perf_counter() - started
+
+    succeeded = len(requests_list) - errors - body_errors
+    return {
+        'requests': len(requests_list),
+        'errors': errors,
+        'body_errors': body_errors,
+        'item_errors': item_errors,
+        'status_codes': status_codes,
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'mean_ms': round(statistics.mean(latencies), 1),
+        'throughput_rps': round(len(requests_list) / duration, 2),
+        'ok_throughput_rps': round(succeeded / duration, 2),
+        'peak_rss_mb': round(sampler.peak / 1024 / 1024, 1) if sampler.peak else None
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_path):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\nSammenlignet med {previous_path} ({previous['meta'].get('revision')}):")
+    for endpoint, current in results['endpoints'].items():
+        old = previous.get('endpoints', {}).get(endpoint)
+        if not old:
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'ok_throughput_rps', 'peak_rss_mb'):
+            if old.get(key) and current.get(key) is not None:
+                changes.append(f"{key} {(current[key] - old[key]) / old[key] * 100:+.1f}%")
+        print(f"{endpoint:>8}: {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=100, help='antal kald pr. endpoint')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--unique-articles', action='store_true',
+                        help='brug en ny artikel-URL for hvert analysekald (ingen cache-hits)')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='miljøvariabel til app-processen')
+    parser.add_argument('--homepages-only', action='store_true',
+                        help='find artikler via forsiderne i stedet for feeds (som før MEDIA_FEEDS)')
+    parser.add_argument('--app-port', type=int, default=0)
+    parser.add_argument('--output', help='gem resultatet som JSON')
+    parser.add_argument('--compare', metavar='JSON', help='tidligere resultat at sammenligne med')
+    parser.add_argument('--serve-app', nargs=2, metavar=('PORT', 'STANDIN_URL'), help=argparse.SUPPRESS)
+    standin.add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve_app:
+        serve_app(int(args.serve_app[0]), args.serve_app[1])
+        return
+
+    import requests
+
+    sources = standin.load_sources()
+    server, base_url = standin.start_server(sources, standin.faults_from_args(args), homepage_kb=args.homepage_kb)
+
+    app_port = args.app_port or free_port()
+    with tempfile.TemporaryDirectory() as instance:
+        env = dict(
+            os.environ,
+            CRAWL_BACKGROUND='0',
+            # Alle stand-in medier deler én vært, så grænserne pr. vært slås fra
+            POLITE_HOST_CONCURRENCY='64',
+            POLITE_MIN_INTERVAL='0',
+            ANALYSIS_CACHE_PATH=os.path.join(instance, 'analysis_cache.sqlite3'),
+            ARTICLE_STORE_PATH=os.path.join(instance, 'articles.sqlite3'),
+            AGGREGATE_PATH=os.path.join(instance, 'aggregates.json'),
+            JOB_QUEUE_PATH=os.path.join(instance, 'jobs.sqlite3'),
+            KEYWORDS_DF_PATH=os.path.join(instance, 'doc_freq.json'),
+            BENCH_FEEDS='0' if args.homepages_only else '1'
+        )
+        env.update(item.split('=', 1) for item in args.env)
+        child = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--serve-app', str(app_port), base_url],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True
+        )
+        try:
+            if child.stdout.readline().strip() != 'READY':
+                raise RuntimeError('Appen startede ikke')
+            app_url = f'http://127.0.0.1:{app_port}'
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+            session.mount('http://', adapter)
+
+            results = {
+                'meta': {
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                    'revision': git_revision(),
+                    'python': platform.python_version(),
+                    'config': {key: value for key, value in vars(args).items() if key != 'serve_app'}
+                },
+                'endpoints': {}
+            }
+            for endpoint in args.endpoints.split(','):
+                endpoint = endpoint.strip()
+                if endpoint not in ENDPOINTS:
+                    parser.error(f'ukendt endpoint: {endpoint}')
+                requests_list = make_requests(endpoint, app_url, base_url, sources,
+                                              args.requests, args.unique_articles)
+                summary = run_endpoint(session, requests_list, args.concurrency, child.pid)
+                results['endpoints'][endpoint] = summary
+                print(f"{endpoint:>8}: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+                      f"p99 {summary['p99_ms']} ms, {summary['throughput_rps']} req/s "
+                      f"({summary['ok_throughput_rps']} vellykkede), fejl {summary['errors']}, "
+                      f"fejl i svaret {summary['body_errors']}, peak RSS {summary['peak_rss_mb']} MB")
+        finally:
+            child.terminate()
+            child.wait()
+            server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
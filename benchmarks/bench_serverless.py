@@ -0,0 +1,109 @@
+"""Måler kolde og varme kald mod serverless-indgangen i api/index.py.
+
+Et koldt kald er en ny proces, der importerer api/index.py (inkl. opvarmning)
+og behandler én request; varme kald er de følgende requests i samme proces.
+Kørslen gentages med og uden opvarmning, så forskellen kan ses.
+
+Eksempler:
+    python benchmarks/bench_serverless.py
+    python benchmarks/bench_serverless.py --route /api/stats --route "/api/articles?limit=20" --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ROUTES = ('/api/stats', '/api/articles?limit=20', '/api/stats?category=Regional')
+
+
+def child(routes, warm_requests):
+    """Kører i en frisk proces: måler import, første kald og varme kald pr. route"""
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from api.index import app
+    init_ms = (time.perf_counter() - started) * 1000
+
+    client = app.test_client()
+    result = {'init_ms': init_ms, 'routes': {}}
+    for route in routes:
+        started = time.perf_counter()
+        response = client.get(route)
+        first_ms = (time.perf_counter() - started) * 1000
+        warm = []
+        for _ in range(warm_requests):
+            started = time.perf_counter()
+            client.get(route)
+            warm.append((time.perf_counter() - started) * 1000)
+        result['routes'][route] = {'status': response.status_code, 'first_ms': first_ms, 'warm_ms': warm}
+    print(json.dumps(result))
+
+
+def run(routes, runs, warm_requests, warm_up):
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                PYTHONDONTWRITEBYTECODE='1',
+                TMPDIR=tmp,
+                SERVERLESS_WARM_UP='1' if warm_up else '0'
+            )
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', json.dumps(routes),
+                 '--warm-requests', str(warm_requests)],
+                cwd=ROOT, env=env, check=True, capture_output=True, text=True
+            ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def summarize(results):
+    summary = {'init_ms': round(statistics.median(r['init_ms'] for r in results), 1), 'routes': {}}
+    for route in results[0]['routes']:
+        first = [r['routes'][route]['first_ms'] for r in results]
+        warm = [ms for r in results for ms in r['routes'][route]['warm_ms']]
+        summary['routes'][route] = {
+            'cold_ms': round(statistics.median(r['init_ms'] + f for r, f in zip(results, first)), 1),
+            'first_request_ms': round(statistics.median(first), 2),
+            'warm_p50_ms': round(statistics.median(warm), 2) if warm else None,
+            'status': results[0]['routes'][route]['status']
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--route', action='append', help='route der kaldes (kan gentages)')
+    parser.add_argument('--runs', type=int, default=5, help='antal kolde starter')
+    parser.add_argument('--warm-requests', type=int, default=50, help='varme kald pr. route')
+    parser.add_argument('--json', action='store_true', help='skriv resultatet som JSON')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(json.loads(args.child), args.warm_requests)
+        return
+
+    routes = args.route or list(DEFAULT_ROUTES)
+    report = {
+        'warm_up': summarize(run(routes, args.runs, args.warm_requests, warm_up=True)),
+        'no_warm_up': summarize(run(routes, args.runs, args.warm_requests, warm_up=False))
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for mode, summary in report.items():
+        print(f"{mode}: import og opvarmning {summary['init_ms']} ms")
+        for route, numbers in summary['routes'].items():
+            print(f"  {route:<32} koldt {numbers['cold_ms']:>8} ms, første kald "
+                  f"{numbers['first_request_ms']:>8} ms, varmt p50 {numbers['warm_p50_ms']} ms "
+                  f"[{numbers['status']}]")
+
+
+if __name__ == '__main__':
+    main()
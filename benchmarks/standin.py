@@ -0,0 +1,310 @@
+"""Lokal stand-in for de fulgte medier til reproducerbare benchmarks.
+
+Serveren svarer på /site/<domæne>/ med en forside, på /site/<domæne>/feed.xml
+med et RSS-feed (med ETag, så betingede GET giver 304) og på
+/site/<domæne>/nyheder/<n> med en artikel. Optagede sider i
+benchmarks/fixtures/<domæne>/ bruges hvis de findes, ellers genereres
+syntetiske sider. Latens, langsomme svar og fejl kan injiceres.
+
+Eksempler:
+    python benchmarks/standin.py --port 8765 --latency-ms 200 --failure-rate 0.05
+    python benchmarks/standin.py --record          # optag rigtige sider til fixtures/
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from urltools import registrable_domain  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ARTICLES_PER_SITE = 40
+WRITE_CHUNK = 1024
+
+SENTENCES = [
+    'Regeringen fremlagde i dag et nyt forslag om skat og økonomi.',
+    'Ifølge ministeren er der tale om en klar fremgang for dansk erhverv.',
+    '"Det er en god dag for Danmark," siger statsministeren.',
+    'Kritikerne frygter dog, at krisen i sundhedsvæsenet bliver værre.',
+    'Politiet har anholdt to personer efter et røveri i weekenden.',
+    'Forskere ved universitetet har offentliggjort et nyt studie om klimaet.',
+    'Kommunen forventer et underskud på budgettet for næste år.',
+    'Landsholdet vandt kampen efter en flot indsats i anden halvleg.',
+    '"Vi er meget tilfredse med resultatet," udtaler direktøren.',
+    'Inflationen faldt en smule i sidste måned, viser nye tal.'
+]
+
+
+def slug_for(url):
+    """Mappenavn og sti-præfiks for et medie, fx 'https://nyheder.tv2.dk' -> 'tv2.dk'"""
+    return registrable_domain(urlsplit(url).hostname)
+
+
+def synthetic_homepage(host, size_kb):
+    """Forside med navigation, script og absolutte links til artikler på mediets vært"""
+    parts = [
+        f'<!DOCTYPE html><html lang="da"><head><meta charset="utf-8"><title>{host}</title>',
+        '<script>', 'window.__data = {"x": 1};' * (size_kb * 16), '</script></head><body><nav>'
+    ]
+    parts.extend(f'<a href="/sektion/{i}">Sektion {i}</a>' for i in range(20))
+    parts.append('</nav><main>')
+    for n in range(ARTICLES_PER_SITE):
+        parts.append(
+            f'<article><a href="https://{host}/nyheder/{n}?utm_source=forside">'
+            f'<h2>{SENTENCES[n % len(SENTENCES)]}</h2></a></article>'
+        )
+    parts.append('</main></body></html>')
+    return ''.join(parts)
+
+
+def synthetic_feed(host):
+    """RSS-feed med de samme artikler som forsiden, nyeste først"""
+    items = ''.join(
+        f'<item><title>{SENTENCES[n % len(SENTENCES)].strip(chr(34))}</title>'
+        f'<link>https://{host}/nyheder/{n}</link>'
+        f'<pubDate>{1 + n % 28:02d} May 2024 08:00:00 +0200</pubDate></item>'
+        for n in range(ARTICLES_PER_SITE)
+    )
+    return (
+        f'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+        f'<title>{host}</title><link>https://{host}/</link>{items}</channel></rss>'
+    )
+
+
+def synthetic_article(host, n):
+    """Artikel med titel, dato og brødtekst som newspaper kan parse"""
+    rng = random.Random(f'{host}-{n}')
+    paragraphs = ''.join(
+        f'<p>{" ".join(rng.choice(SENTENCES) for _ in range(5))}</p>' for _ in range(12)
+    )
+    title = SENTENCES[n % len(SENTENCES)].strip('"')
+    return (
+        f'<!DOCTYPE html><html lang="da"><head><meta charset="utf-8"><title>{title}</title>'
+        f'<meta property="article:published_time" content="2024-05-{1 + n % 28:02d}T08:00:00+02:00">'
+        f'</head><body><article><h1>{title}</h1>{paragraphs}</article></body></html>'
+    )
+
+
+class Fixtures:
+    """Optagede eller syntetiske sider for alle medier"""
+
+    def __init__(self, sources, homepage_kb=300, fixtures_dir=FIXTURES_DIR):
+        self.hosts = {slug_for(url): urlsplit(url).hostname for url in sources.values()}
+        self.homepage_kb = homepage_kb
+        self.fixtures_dir = fixtures_dir
+        self._cache = {}
+
+    def _recorded(self, slug, name):
+        path = os.path.join(self.fixtures_dir, slug, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+        return None
+
+    def get(self, slug, path):
+        """Returnerer sidens bytes eller None hvis den ikke findes"""
+        if slug not in self.hosts:
+            return None
+        key = (slug, path)
+        if key not in self._cache:
+            host = self.hosts[slug]
+            match = re.fullmatch(r'nyheder/(\d+)', path.strip('/'))
+            if not path.strip('/'):
+                body = self._recorded(slug, 'homepage.html') or \
+                    synthetic_homepage(host, self.homepage_kb).encode('utf-8')
+            elif path.strip('/') == 'feed.xml':
+                body = self._recorded(slug, 'feed.xml') or synthetic_feed(host).encode('utf-8')
+            elif match:
+                n = int(match.group(1))
+                body = self._recorded(slug, f'article-{n}.html') or \
+                    synthetic_article(host, n).encode('utf-8')
+            else:
+                body = None
+            self._cache[key] = body
+        return self._cache[key]
+
+
+class Faults:
+    """Injicerede fejl: latens med jitter, begrænset båndbredde og fejlrate"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, bytes_per_sec=0, failure_rate=0.0,
+                 slow_hosts=(), seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bytes_per_sec = bytes_per_sec
+        self.failure_rate = failure_rate
+        self.slow_hosts = set(slow_hosts)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def roll(self):
+        with self._lock:
+            return self._rng.random(), self._rng.uniform(-1, 1)
+
+
+def make_handler(fixtures, faults):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            match = re.match(r'/site/([^/]+)/?(.*)', urlsplit(self.path).path)
+            body = fixtures.get(match.group(1), match.group(2)) if match else None
+            slug = match.group(1) if match else None
+
+            failure, jitter = faults.roll()
+            latency = faults.latency_ms + faults.jitter_ms * jitter
+            if slug in faults.slow_hosts:
+                latency *= 10
+            if latency > 0:
+                time.sleep(latency / 1000)
+            if failure < faults.failure_rate / 2:
+                # Forbindelsen lukkes uden svar
+                self.close_connection = True
+                return
+            if failure < faults.failure_rate:
+                self.send_error(503)
+                return
+            if body is None:
+                self.send_error(404)
+                return
+
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            feed = self.path.rstrip('/').endswith('/feed.xml')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/rss+xml; charset=utf-8' if feed else 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            if not faults.bytes_per_sec:
+                self.wfile.write(body)
+                return
+            for start in range(0, len(body), WRITE_CHUNK):
+                self.wfile.write(body[start:start + WRITE_CHUNK])
+                self.wfile.flush()
+                time.sleep(WRITE_CHUNK / faults.bytes_per_sec)
+
+    return Handler
+
+
+def start_server(sources, faults, port=0, homepage_kb=300):
+    """Starter stand-in serveren i en baggrundstråd og returnerer (server, basis-URL)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(Fixtures(sources, homepage_kb), faults))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='standin', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def local_sources(sources, base_url):
+    """MEDIA_SOURCES med hvert medie peget over på stand-in serveren"""
+    return {name: f'{base_url}/site/{slug_for(url)}/' for name, url in sources.items()}
+
+
+def local_feeds(feeds, sources, base_url):
+    """MEDIA_FEEDS med hvert medies feed peget over på stand-in serveren"""
+    return {name: [f'{base_url}/site/{slug_for(sources[name])}/feed.xml'] for name in feeds if name in sources}
+
+
+def record(sources, articles=5, fixtures_dir=FIXTURES_DIR):
+    """Optager hver forside og de første artikler fra de rigtige medier"""
+    import requests
+
+    from linkextract import extract_links
+
+    for name, url in sources.items():
+        slug = slug_for(url)
+        target = os.path.join(fixtures_dir, slug)
+        os.makedirs(target, exist_ok=True)
+        try:
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f'{name}: {e}')
+            continue
+        with open(os.path.join(target, 'homepage.html'), 'wb') as f:
+            f.write(response.content)
+
+        def same_site(href):
+            return bool(urlsplit(href).hostname) and slug_for(href) == slug
+
+        links = extract_links([response.text], response.url, accept=same_site, limit=articles)
+        for n, link in enumerate(links):
+            try:
+                article = requests.get(link['url'], timeout=10)
+                article.raise_for_status()
+            except requests.RequestException as e:
+                print(f'{name}: {e}')
+                continue
+            with open(os.path.join(target, f'article-{n}.html'), 'wb') as f:
+                f.write(article.content)
+        print(f'{name}: forside og {len(links)} artikler')
+
+
+def load_sources():
+    """Læser MEDIA_SOURCES fra app.py uden at importere hele appen"""
+    import ast
+
+    with open(os.path.join(ROOT, 'app.py'), encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], 'id', None) == 'MEDIA_SOURCES':
+            return ast.literal_eval(node.value)
+    raise RuntimeError('MEDIA_SOURCES blev ikke fundet i app.py')
+
+
+def add_fault_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=25)
+    parser.add_argument('--bytes-per-sec', type=int, default=0, help='0 = ubegrænset')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--slow-host', action='append', default=[], help='fx dr.dk; 10x latens')
+    parser.add_argument('--homepage-kb', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def faults_from_args(args):
+    return Faults(args.latency_ms, args.jitter_ms, args.bytes_per_sec, args.failure_rate,
+                  args.slow_host, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--record', action='store_true', help='optag rigtige sider og afslut')
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    sources = load_sources()
+    if args.record:
+        record(sources)
+        return
+    server, base_url = start_server(sources, faults_from_args(args), args.port, args.homepage_kb)
+    for name, url in local_sources(sources, base_url).items():
+        print(f'{name:>22}: {url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
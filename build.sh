@@ -6,5 +6,9 @@ python -m pip install --upgrade pip
 # Install dependencies
 pip install -r requirements.txt
 
+# Download NLTK data once at build time; analysis.py loads it lazily from here
+NLTK_DATA_DIR="${NLTK_DATA:-$(dirname "$0")/nltk_data}"
+python -m nltk.downloader -d "$NLTK_DATA_DIR" punkt averaged_perceptron_tagger maxent_ne_chunker words
+
 # Download spaCy model
 python -m spacy download en_core_web_sm
@@ -0,0 +1,264 @@
+"""Baggrundscrawler med snapshot pr. medie (stale-while-revalidate)"""
+import json
+import os
+import threading
+import time
+
+import scraper
+from records import Link
+
+CRAWL_INTERVAL = float(os.getenv('CRAWL_INTERVAL', '300'))
+# Første pause før et fejlet medie hentes igen; fordobles op til intervallet
+CRAWL_RETRY = float(os.getenv('CRAWL_RETRY', '30'))
+CRAWL_BACKGROUND = os.getenv('CRAWL_BACKGROUND', '1') == '1'
+CRAWL_SNAPSHOT_PATH = os.getenv('CRAWL_SNAPSHOT_PATH')
+
+
+class SnapshotCrawler:
+    """Holder det seneste resultat for hvert medie og opdaterer det i baggrunden.
+
+    Læsninger returnerer altid straks det snapshot der findes. Kilder der er
+    ældre end intervallet opdateres asynkront; kilder der aldrig er hentet
+    hentes synkront, så første kald ikke giver et tomt svar. Artiklerne er
+    records.Link-poster; på disk gemmes de som dicts.
+
+    Uden background (CRAWL_BACKGROUND=0, fx serverless, hvor tråde fryses når
+    svaret er sendt) startes der ingen tråde: forældede kilder hentes i
+    stedet synkront inden for fristen, og fejler de, gives det gamle snapshot.
+
+    En fejlet hentning prøves først igen efter CRAWL_RETRY sekunder (fordoblet
+    for hver fejl i træk, højst intervallet), så et medie der er nede ikke
+    hentes ved hvert kald.
+    """
+
+    def __init__(self, sources, extract, interval=CRAWL_INTERVAL, path=CRAWL_SNAPSHOT_PATH, feeds=None,
+                 background=CRAWL_BACKGROUND, retry=CRAWL_RETRY):
+        self.sources = sources
+        self.background = background
+        self.extract = extract
+        self.feeds = feeds or {}
+        self.interval = interval
+        self.retry = retry
+        self.path = path
+        self._snapshots = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._load()
+
+    def _load(self):
+        """Indlæser et gemt snapshot fra disk, hvis det findes"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Kunne ikke indlæse snapshot {self.path}: {str(e)}")
+            return
+        self._snapshots = {
+            source: dict(snapshot, articles=[Link.from_dict(article) for article in snapshot['articles']])
+            for source, snapshot in data.items()
+            if source in self.sources
+        }
+
+    def _save(self):
+        """Skriver snapshots atomisk til disk"""
+        if not self.path:
+            return
+        with self._lock:
+            data = dict(self._snapshots)
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=Link.to_dict)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Kunne ikke gemme snapshot {self.path}: {str(e)}")
+
+    def _store(self, name, articles, source_status, now):
+        previous = self._snapshots.get(name)
+        if source_status['status'] != 'ok':
+            failures = previous.get('failures', 0) + 1 if previous else 1
+            retry_at = now + min(self.retry * 2 ** (failures - 1), self.interval)
+            if previous:
+                # Behold sidste gode resultat, men noter fejlen
+                previous.update(status=source_status, failures=failures, retry_at=retry_at)
+            else:
+                # Intet at falde tilbage på: gem fejlen som forældet, så den
+                # prøves igen, når pausen er gået
+                self._snapshots[name] = {
+                    'articles': articles,
+                    'status': source_status,
+                    'fetched_at': now - self.interval,
+                    'failures': failures,
+                    'retry_at': retry_at
+                }
+            return
+        self._snapshots[name] = {
+            'articles': articles,
+            'status': source_status,
+            'fetched_at': now
+        }
+
+    def _claim(self, names):
+        """Markerer kilderne som under hentning; kilder en anden tråd henter udelades"""
+        with self._lock:
+            names = [name for name in names if name not in self._refreshing]
+            self._refreshing.update(names)
+        return names
+
+    def _release(self, names):
+        with self._lock:
+            self._refreshing.difference_update(names)
+        self._save()
+
+    def _iter_refresh(self, names, deadline=None):
+        """Henter kilderne og giver navnet på hver kilde, så snart dens snapshot er opdateret.
+
+        Kilder der allerede hentes af en anden tråd springes over.
+        """
+        names = self._claim(names)
+        if not names:
+            return
+        try:
+            for name, articles, source_status in scraper.iter_fetch(
+                    {name: self.sources[name] for name in names}, self.extract, deadline, self.feeds):
+                with self._lock:
+                    self._store(name, articles, source_status, time.time())
+                yield name
+        finally:
+            self._release(names)
+
+    def refresh(self, sources=None, deadline=None):
+        """Henter de angivne kilder (standard: alle) og opdaterer snapshots"""
+        names = list(self.sources if sources is None else sources)
+        for _ in self._iter_refresh(names, deadline):
+            pass
+
+    def _refresh_async(self, names):
+        threading.Thread(target=self.refresh, args=(names,), daemon=True).start()
+
+    def stale_sources(self, now=None):
+        """Kilder hvis snapshot er ældre end intervallet, og som ikke holder pause efter en fejl"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [
+                name for name, snapshot in self._snapshots.items()
+                if now - snapshot['fetched_at'] >= self.interval and now >= snapshot.get('retry_at', 0)
+            ]
+
+    def _entry(self, name, now):
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            # Kilden hentes af en anden tråd eller nåede ikke at svare
+            return name, [], {'status': 'pending', 'age_s': None, 'stale': True}
+        age = now - snapshot['fetched_at']
+        return name, snapshot['articles'], dict(
+            snapshot['status'],
+            age_s=round(age, 1),
+            stale=age >= self.interval
+        )
+
+    def _split(self):
+        """Deler medierne i dem der gives straks og dem der hentes nu.
+
+        Forældede medier opdateres i en baggrundstråd, eller uden background
+        sammen med de medier der ikke har et snapshot.
+        """
+        with self._lock:
+            present = [name for name in self.sources if name in self._snapshots]
+            missing = [name for name in self.sources if name not in self._snapshots]
+        stale = self.stale_sources()
+        if stale and self.background:
+            self._refresh_async(stale)
+        elif stale:
+            present = [name for name in present if name not in stale]
+            missing = [name for name in self.sources if name not in present]
+        return present, missing
+
+    def iter_snapshot(self):
+        """Giver (kilde, artikler, status med alder) for hvert medie, så snart det er klar.
+
+        Medier med et snapshot gives straks; medier der aldrig er hentet (og
+        uden background også forældede medier) gives efterhånden som de hentes.
+        """
+        present, missing = self._split()
+        now = time.time()
+        for name in present:
+            yield self._entry(name, now)
+
+        fetched = set()
+        for name in self._iter_refresh(missing):
+            fetched.add(name)
+            yield self._entry(name, time.time())
+        now = time.time()
+        for name in missing:
+            if name not in fetched:
+                yield self._entry(name, now)
+
+    async def aiter_snapshot(self, fetch, deadline=None):
+        """Som iter_snapshot, men henter manglende medier med en async fetch.
+
+        fetch(kilder, extract, deadline, feeds) er en async generator der giver
+        (kilde, artikler, status) som aioscraper.iter_fetch. Forældede medier
+        opdateres som i iter_snapshot.
+        """
+        present, missing = self._split()
+        now = time.time()
+        for name in present:
+            yield self._entry(name, now)
+
+        fetched = set()
+        names = self._claim(missing)
+        try:
+            if names:
+                async for name, articles, source_status in fetch(
+                        {name: self.sources[name] for name in names}, self.extract, deadline, self.feeds):
+                    with self._lock:
+                        self._store(name, articles, source_status, time.time())
+                    fetched.add(name)
+                    yield self._entry(name, time.time())
+        finally:
+            if names:
+                self._release(names)
+        now = time.time()
+        for name in missing:
+            if name not in fetched:
+                yield self._entry(name, now)
+
+    def snapshot(self):
+        """Returnerer (artikler pr. kilde, status pr. kilde med alder i sekunder)"""
+        results = {}
+        status = {}
+        for name, articles, source_status in self.iter_snapshot():
+            results[name] = articles
+            status[name] = source_status
+        return results, status
+
+    async def asnapshot(self, fetch, deadline=None):
+        """Som snapshot, men med aiter_snapshot"""
+        results = {}
+        status = {}
+        async for name, articles, source_status in self.aiter_snapshot(fetch, deadline):
+            results[name] = articles
+            status[name] = source_status
+        return results, status
+
+    def _run(self):
+        while True:
+            time.sleep(min(self.interval / 4, 30))
+            stale = self.stale_sources()
+            if stale:
+                self.refresh(stale)
+
+    def start(self):
+        """Starter baggrundsplanlæggeren (idempotent)"""
+        if not self.background:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='crawler', daemon=True)
+        self._thread.start()
@@ -0,0 +1,162 @@
+"""Fælles, begrænset hentning af sider: streamet, med loft over størrelsen og tidlig afkodning.
+
+Bruges af scraper.py, aioscraper.py og analysis.py, så en enkelt kæmpe
+eller forkert side ikke kan fylde en arbejders hukommelse. Tegnsættet
+bestemmes ud fra Content-Type eller de første kilobytes, hvorefter resten
+afkodes bid for bid og sendes direkte videre til parseren.
+"""
+import codecs
+import os
+import re
+
+DOWNLOAD_MAX_BYTES = int(os.getenv('DOWNLOAD_MAX_BYTES', str(5 * 1024 * 1024)))
+CHUNK_SIZE = 16 * 1024
+# Så meget læses før tegnsættet bestemmes (<meta charset> står i <head>)
+SNIFF_BYTES = 4096
+
+HTML_TYPES = frozenset({'text/html', 'application/xhtml+xml'})
+FEED_TYPES = HTML_TYPES | {'application/rss+xml', 'application/atom+xml', 'application/xml', 'text/xml'}
+
+CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([^"\';\s]+)', re.I)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([A-Za-z0-9_.:-]+)', re.I)
+XML_ENCODING_RE = re.compile(rb'<\?xml[^>]+encoding\s*=\s*["\']([A-Za-z0-9_.:-]+)', re.I)
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16')
+)
+
+
+class DownloadError(Exception):
+    """Svaret blev afvist, før eller mens det blev hentet"""
+
+
+class UnsupportedContent(DownloadError):
+    """Svaret er ikke HTML (eller XML for feeds)"""
+
+
+class TooLarge(DownloadError):
+    """Svaret er større end loftet"""
+
+
+def media_type(content_type):
+    """'text/html; charset=utf-8' -> 'text/html'"""
+    return content_type.split(';', 1)[0].strip().lower()
+
+
+def _known(encoding):
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+def sniff_charset(head, content_type=None):
+    """Bestemmer tegnsættet: BOM, Content-Type, <meta>/<?xml?> og ellers UTF-8 eller Windows-1252"""
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = CHARSET_RE.search(content_type or '')
+    if match and _known(match.group(1)):
+        return match.group(1)
+    for pattern in (META_CHARSET_RE, XML_ENCODING_RE):
+        match = pattern.search(head)
+        if match and _known(match.group(1).decode('ascii')):
+            return match.group(1).decode('ascii')
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # En fejl i de sidste bytes er blot et tegn der er delt over bidgrænsen
+        if e.start < len(head) - 3:
+            return 'windows-1252'
+    return 'utf-8'
+
+
+def check_headers(headers, accept=HTML_TYPES, max_bytes=DOWNLOAD_MAX_BYTES):
+    """Afviser svar med forkert Content-Type eller en Content-Length over loftet (None: intet loft)"""
+    content_type = headers.get('Content-Type')
+    if content_type and media_type(content_type) not in accept:
+        raise UnsupportedContent(f'Ikke understøttet indholdstype: {media_type(content_type)}')
+    length = headers.get('Content-Length')
+    if max_bytes is not None and length and length.isdigit() and int(length) > max_bytes:
+        raise TooLarge(f'Svaret er {length} bytes; loftet er {max_bytes}')
+
+
+class StreamDecoder:
+    """Afkoder bytes bid for bid med et loft over det samlede antal bytes.
+
+    Indtil SNIFF_BYTES er modtaget, holdes bytes tilbage, så tegnsættet kan
+    bestemmes; derefter afkodes hvert bid med det samme. Over loftet kastes
+    TooLarge, eller (med truncate) afkodes resten ikke.
+    """
+
+    def __init__(self, content_type=None, max_bytes=DOWNLOAD_MAX_BYTES, truncate=False):
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.truncate = truncate
+        self.received = 0
+        self.truncated = False
+        self.encoding = None
+        self._head = bytearray()
+        self._decoder = None
+
+    def feed(self, chunk):
+        if self.truncated:
+            return ''
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            if not self.truncate:
+                raise TooLarge(f'Svaret er over loftet på {self.max_bytes} bytes')
+            chunk = chunk[:len(chunk) - (self.received - self.max_bytes)]
+            self.truncated = True
+        if self._decoder is not None:
+            return self._decoder.decode(chunk)
+        self._head += chunk
+        if len(self._head) < SNIFF_BYTES and not self.truncated:
+            return ''
+        return self._start()
+
+    def _start(self):
+        head = bytes(self._head)
+        self._head = None
+        self.encoding = sniff_charset(head, self.content_type)
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        return self._decoder.decode(head)
+
+    def close(self):
+        text = self._start() if self._decoder is None else ''
+        return text + self._decoder.decode(b'', final=True)
+
+
+def iter_text(chunks, content_type=None, max_bytes=DOWNLOAD_MAX_BYTES, truncate=False):
+    """Afkoder en strøm af bytes til tekstbidder (se StreamDecoder)"""
+    decoder = StreamDecoder(content_type, max_bytes, truncate)
+    for chunk in chunks:
+        text = decoder.feed(chunk)
+        if text:
+            yield text
+        if decoder.truncated:
+            break
+    tail = decoder.close()
+    if tail:
+        yield tail
+
+
+def limit_bytes(chunks, max_bytes=DOWNLOAD_MAX_BYTES):
+    """Giver bidderne videre uændret, men kaster TooLarge over loftet"""
+    received = 0
+    for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise TooLarge(f'Svaret er over loftet på {max_bytes} bytes')
+        yield chunk
+
+
+def fetch_text(session, url, timeout, accept=HTML_TYPES, max_bytes=DOWNLOAD_MAX_BYTES):
+    """Henter en side med en requests-session og returnerer den afkodede tekst"""
+    with session.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        check_headers(response.headers, accept, max_bytes)
+        return ''.join(iter_text(
+            response.iter_content(CHUNK_SIZE), response.headers.get('Content-Type'), max_bytes
+        ))
@@ -0,0 +1,126 @@
+"""Inkrementel parsing af RSS-, Atom-feeds og nyheds-sitemaps der modtages i bidder"""
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+from linkextract import MAX_TITLE_CHARS
+
+# Elementer der hver beskriver én artikel: RSS <item>, Atom <entry> og sitemap <url>
+ENTRY_TAGS = frozenset({'item', 'entry', 'url'})
+
+
+def _local(tag):
+    """Tag uden XML-navnerum, fx '{http://www.w3.org/2005/Atom}entry' -> 'entry'"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_date(value):
+    """Læser en RFC 822- (RSS) eller ISO 8601-dato (Atom, sitemaps) til ISO-format i UTC"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _entry(element, base_url):
+    """Returnerer {'url', 'title', 'published'} for et <item>, <entry> eller <url>"""
+    url = title = published = updated = None
+    for child in element.iter():
+        name = _local(child.tag)
+        text = (child.text or '').strip()
+        if name in ('link', 'loc') and url is None:
+            # Atom har linket i href (rel="alternate" eller uden rel), RSS og sitemaps som tekst
+            href = child.get('href')
+            if href is not None:
+                if child.get('rel', 'alternate') == 'alternate':
+                    url = href.strip()
+            elif text:
+                url = text
+        elif name == 'guid' and url is None and child.get('isPermaLink', 'true') == 'true' and text:
+            url = text
+        elif name == 'title' and title is None:
+            title = text
+        elif name in ('pubDate', 'published', 'publication_date', 'date') and published is None:
+            published = parse_date(text)
+        elif name in ('updated', 'lastmod') and updated is None:
+            updated = parse_date(text)
+    if not url:
+        return None
+    return {
+        'url': urljoin(base_url, url),
+        'title': (title or '')[:MAX_TITLE_CHARS],
+        'published': published or updated
+    }
+
+
+class FeedParser:
+    """Samler artikler fra et feed eller sitemap, indtil der er nok der opfylder accept.
+
+    Færdige elementer fjernes fra træet, så hukommelsen ikke vokser med
+    feedets længde.
+    """
+
+    def __init__(self, base_url, accept=None, limit=10):
+        self.base_url = base_url
+        self.accept = accept
+        self.limit = limit
+        self.entries = []
+        self._parser = XMLPullParser(events=('start', 'end'))
+        self._stack = []
+
+    @property
+    def done(self):
+        return len(self.entries) >= self.limit
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+        self._drain()
+
+    def close(self):
+        self._parser.close()
+        self._drain()
+
+    def _drain(self):
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                self._stack.append(element)
+                continue
+            self._stack.pop()
+            if _local(element.tag) not in ENTRY_TAGS or self.done:
+                continue
+            entry = _entry(element, self.base_url)
+            if self._stack:
+                self._stack[-1].remove(element)
+            if entry is not None and (self.accept is None or self.accept(entry['url'])):
+                self.entries.append(entry)
+
+
+def extract_entries(chunks, base_url, accept=None, limit=10):
+    """Returnerer op til limit artikler fra en strøm af bytes (eller tekst) med XML.
+
+    Parsingen stopper, så snart der er fundet nok, og resten af strømmen
+    læses ikke. Et ufuldstændigt feed giver de artikler der nåede at komme;
+    er der ingen, kastes ValueError.
+    """
+    parser = FeedParser(base_url, accept, limit)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            if parser.done:
+                break
+        else:
+            parser.close()
+    except ParseError as e:
+        if not parser.entries:
+            raise ValueError(f'Ugyldigt feed: {str(e)}')
+    return parser.entries
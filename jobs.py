@@ -0,0 +1,245 @@
+"""Kø af analysejob med prioriteter, der overlever genstart (SQLite)"""
+import heapq
+import itertools
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from urltools import canonicalize_url
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_QUEUE_MAX = int(os.getenv('JOB_QUEUE_MAX', '1000'))
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', '3600'))
+JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', '30'))
+
+# Lavere tal køres først
+PRIORITIES = {'interactive': 0, 'bulk': 10}
+PRIORITY_NAMES = {level: name for name, level in PRIORITIES.items()}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    url_key TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, created_at);
+'''
+
+
+class QueueFull(Exception):
+    """Køen har nået JOB_QUEUE_MAX ventende job"""
+
+
+class JobQueue:
+    """Kører analyser i en begrænset pulje af tråde, højeste prioritet først.
+
+    Et job for en URL der allerede venter eller kører, giver det eksisterende
+    job (med den højeste af de to prioriteter). Ventende og igangværende job
+    gemmes i SQLite og sættes i kø igen ved opstart.
+    """
+
+    def __init__(self, run, path=None, workers=JOB_WORKERS, max_pending=JOB_QUEUE_MAX,
+                 result_ttl=JOB_RESULT_TTL):
+        self.run = run
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._jobs = {}
+        self._pending = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        """Indlæser gemte job; dem der ventede eller kørte ved nedlukning sættes i kø igen"""
+        with self._db_lock:
+            self._db.execute(
+                'DELETE FROM jobs WHERE finished_at < ?', (time.time() - self.result_ttl,)
+            )
+            self._db.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+            self._db.commit()
+            rows = self._db.execute(
+                'SELECT id, url, url_key, priority, status, result, created_at, started_at, finished_at '
+                'FROM jobs ORDER BY priority, created_at'
+            ).fetchall()
+        for job_id, url, url_key, priority, status, result, created_at, started_at, finished_at in rows:
+            job = {
+                'id': job_id, 'url': url, 'url_key': url_key, 'priority': priority,
+                'status': status, 'result': None if result is None else json.loads(result),
+                'created_at': created_at, 'started_at': started_at, 'finished_at': finished_at
+            }
+            self._jobs[job_id] = job
+            if status == 'queued':
+                self._pending[url_key] = job
+                heapq.heappush(self._heap, (priority, next(self._seq), job_id))
+
+    def _write(self, job):
+        if self._db is None:
+            return
+        result = None if job['result'] is None else json.dumps(job['result'], ensure_ascii=False, default=str)
+        with self._db_lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO jobs (id, url, url_key, priority, status, result, '
+                'created_at, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job['id'], job['url'], job['url_key'], job['priority'], job['status'], result,
+                 job['created_at'], job['started_at'], job['finished_at'])
+            )
+            self._db.commit()
+
+    def start(self):
+        """Starter arbejdstrådene (idempotent)"""
+        with self._cond:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f'job-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, url, priority='interactive'):
+        """Lægger en analyse i kø og returnerer jobbet (eller det ventende job for samme URL).
+
+        Kaster ValueError ved ukendt prioritet og QueueFull hvis køen er fuld.
+        """
+        # Prioriteten kommer fra JSON og kan være en liste eller et objekt
+        if not isinstance(priority, str) or priority not in PRIORITIES:
+            raise ValueError(f'Ukendt prioritet: {priority}')
+        level = PRIORITIES[priority]
+        key = canonicalize_url(url)
+        with self._cond:
+            job = self._pending.get(key)
+            if job is not None:
+                if level < job['priority'] and job['status'] == 'queued':
+                    # Samme job rykkes frem; den gamle plads i heapen springes over
+                    job['priority'] = level
+                    heapq.heappush(self._heap, (level, next(self._seq), job['id']))
+                    self._write(job)
+                return self._public(job)
+            if len(self._pending) >= self.max_pending:
+                raise QueueFull(f'Højst {self.max_pending} ventende job')
+            job = {
+                'id': uuid.uuid4().hex, 'url': url, 'url_key': key, 'priority': level,
+                'status': 'queued', 'result': None, 'created_at': time.time(),
+                'started_at': None, 'finished_at': None
+            }
+            self._jobs[job['id']] = job
+            self._pending[key] = job
+            heapq.heappush(self._heap, (level, next(self._seq), job['id']))
+            self._write(job)
+            self._cond.notify_all()
+            return self._public(job)
+
+    def _next(self):
+        """Tager det næste job fra heapen; kaldes med låsen holdt"""
+        while self._heap:
+            level, _, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            if job is not None and job['status'] == 'queued' and job['priority'] == level:
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next()
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                self._write(job)
+            try:
+                result = self.run(job['url'])
+            except Exception as e:
+                result = {'error': str(e)}
+            with self._cond:
+                job['result'] = result
+                job['status'] = 'error' if 'error' in result else 'done'
+                job['finished_at'] = time.time()
+                self._pending.pop(job['url_key'], None)
+                self._write(job)
+                self._purge(job['finished_at'])
+                self._cond.notify_all()
+
+    def _purge(self, now):
+        """Glemmer færdige job ældre end result_ttl; kaldes med låsen holdt"""
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and now - job['finished_at'] >= self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired and self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    'DELETE FROM jobs WHERE finished_at < ?', (now - self.result_ttl,)
+                )
+                self._db.commit()
+
+    def _public(self, job):
+        data = {
+            'id': job['id'],
+            'url': job['url'],
+            'status': job['status'],
+            'priority': PRIORITY_NAMES.get(job['priority'], job['priority']),
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at']
+        }
+        if job['status'] == 'queued':
+            data['position'] = sum(
+                1 for other in self._pending.values()
+                if other['status'] == 'queued' and
+                (other['priority'], other['created_at']) < (job['priority'], job['created_at'])
+            )
+        if job['result'] is not None:
+            data['result'] = job['result']
+        return data
+
+    def get(self, job_id, wait=0):
+        """Returnerer jobbet; venter op til wait sekunder på at det bliver færdigt.
+
+        Returnerer None for ukendte (eller udløbne) job; kaster ValueError
+        hvis wait ikke er et endeligt tal (fx ?wait=nan).
+        """
+        if not math.isfinite(wait):
+            raise ValueError('wait skal være et endeligt antal sekunder')
+        deadline = time.monotonic() + min(max(wait, 0), JOB_MAX_WAIT)
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            while job['finished_at'] is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._public(job)
+
+    def stats(self):
+        with self._cond:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {'workers': self.workers, 'jobs': counts}
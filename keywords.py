@@ -0,0 +1,260 @@
+"""Nøgleord og resumé for danske artikler.
+
+Nøgleord vægtes med TF-IDF, hvor dokumentfrekvenserne tælles op for hver
+analyseret artikel og gemmes mellem genstarter; indtil der findes en
+gemt fil, startes fra data/doc_freq_da.json. Resuméet er de sætninger
+hvis ord samlet vejer mest, i artiklens rækkefølge.
+
+Udtrækket er delt i to: prepare() deler teksten op (kan køre i en
+arbejdsproces), og rank() vægter med dokumentfrekvenserne, så det sker i
+den proces der tæller dem op og altid bruger de nyeste tal.
+"""
+import atexit
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from sentiment import tokenize
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STOPWORDS_PATH = os.path.join(ROOT, 'data', 'stopwords_da.txt')
+KEYWORDS_DF_PATH = os.getenv('KEYWORDS_DF_PATH', os.path.join(ROOT, 'instance', 'doc_freq.json'))
+KEYWORDS_DF_SEED = os.getenv('KEYWORDS_DF_SEED', os.path.join(ROOT, 'data', 'doc_freq_da.json'))
+KEYWORDS_MAX_TERMS = int(os.getenv('KEYWORDS_MAX_TERMS', '200000'))
+KEYWORDS_CHECKPOINT_INTERVAL = float(os.getenv('KEYWORDS_CHECKPOINT_INTERVAL', '60'))
+
+MAX_KEYWORDS = 10
+SUMMARY_SENTENCES = 5
+MIN_TERM_LENGTH = 3
+MIN_SENTENCE_TERMS = 3
+TITLE_BOOST = 1.5
+
+# Sætningsgrænse: ., ! eller ? efterfulgt af mellemrum og stort bogstav, tal eller citat
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+(?=[A-ZÆØÅ0-9"«“„–-])')
+# Forkortelser der ikke afslutter en sætning
+ABBREVIATIONS = frozenset({
+    'bl.a.', 'f.eks.', 'ca.', 'dvs.', 'kl.', 'nr.', 'mv.', 'jf.', 'hhv.', 'pga.',
+    'evt.', 'inkl.', 'ekskl.', 'mht.', 'vedr.', 'osv.', 'etc.', 'mio.', 'mia.', 'kr.'
+})
+
+_stopwords = None
+_document_frequencies = None
+_lock = threading.Lock()
+
+
+def load_stopwords(path=STOPWORDS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return frozenset(
+            line.strip().lower() for line in f
+            if line.strip() and not line.startswith('#')
+        )
+
+
+def get_stopwords():
+    global _stopwords
+    if _stopwords is None:
+        with _lock:
+            if _stopwords is None:
+                _stopwords = load_stopwords()
+    return _stopwords
+
+
+def content_terms(text):
+    """Ord der kan være nøgleord: små bogstaver, ikke stopord, mindst tre tegn"""
+    stopwords = get_stopwords()
+    return [
+        token for token in tokenize(text)
+        if len(token) >= MIN_TERM_LENGTH and token not in stopwords
+    ]
+
+
+def split_sentences(text):
+    """Deler en tekst i sætninger; afsnit er altid en grænse"""
+    sentences = []
+    for paragraph in text.split('\n'):
+        pending = ''
+        for fragment in SENTENCE_END_RE.split(paragraph.strip()):
+            pending = f'{pending} {fragment}' if pending else fragment
+            last_word = pending.rsplit(None, 1)[-1].lower() if pending else ''
+            if last_word not in ABBREVIATIONS:
+                sentences.append(pending)
+                pending = ''
+        if pending:
+            sentences.append(pending)
+    return [sentence for sentence in sentences if sentence]
+
+
+class DocumentFrequencies:
+    """I hvor mange artikler hvert ord er set, til IDF-vægtene.
+
+    Tælles op for hver ny artikel og skrives med jævne mellemrum atomisk til
+    disk. Bliver ordforrådet større end max_terms, glemmes de sjældneste ord.
+    Findes path ikke endnu, startes fra seed_path.
+    """
+
+    def __init__(self, path=None, max_terms=KEYWORDS_MAX_TERMS,
+                 checkpoint_interval=KEYWORDS_CHECKPOINT_INTERVAL, seed_path=None):
+        self.path = path
+        self.seed_path = seed_path
+        self.max_terms = max_terms
+        self.checkpoint_interval = checkpoint_interval
+        self.documents = 0
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_checkpoint = time.monotonic()
+        self._load()
+        if path:
+            atexit.register(self.checkpoint)
+
+    def _load(self):
+        path = self.path if self.path and os.path.exists(self.path) else self.seed_path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Kunne ikke indlæse dokumentfrekvenser {path}: {str(e)}")
+            return
+        self.documents = data['documents']
+        self.counts = data['counts']
+
+    def idf(self, term):
+        """Udglattet IDF; uden korpus giver alle ord vægten 1"""
+        return math.log((1 + self.documents) / (1 + self.counts.get(term, 0))) + 1
+
+    def add(self, terms):
+        """Tæller en artikels (unikke) ord med"""
+        with self._lock:
+            self.documents += 1
+            counts = self.counts
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            if len(counts) > self.max_terms:
+                self._prune()
+            self._dirty = True
+            due = time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+        if due:
+            self.checkpoint()
+
+    def _prune(self):
+        """Fjerner de sjældneste ord, til ordforrådet er under 90 % af loftet"""
+        threshold = 1
+        target = int(self.max_terms * 0.9)
+        while len(self.counts) > target:
+            self.counts = {term: count for term, count in self.counts.items() if count > threshold}
+            threshold += 1
+
+    def checkpoint(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'documents': self.documents, 'counts': dict(self.counts)}
+            self._dirty = False
+            self._last_checkpoint = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Kunne ikke gemme dokumentfrekvenser {self.path}: {str(e)}")
+
+
+def get_document_frequencies():
+    """Dokumentfrekvenserne for processen (indlæses første gang de bruges)"""
+    global _document_frequencies
+    if _document_frequencies is None:
+        with _lock:
+            if _document_frequencies is None:
+                _document_frequencies = DocumentFrequencies(KEYWORDS_DF_PATH, seed_path=KEYWORDS_DF_SEED)
+    return _document_frequencies
+
+
+class Document:
+    """En artikel delt op til udtræk: sætninger, ord pr. sætning, titlens ord og ordtal"""
+
+    __slots__ = ('sentences', 'sentence_terms', 'title_terms', 'counts')
+
+    def __init__(self, sentences, sentence_terms, title_terms, counts):
+        self.sentences = sentences
+        self.sentence_terms = sentence_terms
+        self.title_terms = title_terms
+        self.counts = counts
+
+    @property
+    def terms(self):
+        """Artiklens unikke ord (til dokumentfrekvenserne)"""
+        return set(self.counts)
+
+
+def prepare(title, text):
+    """Deler titel og tekst op; kræver ikke dokumentfrekvenserne"""
+    sentences = split_sentences(text or '')
+    sentence_terms = [content_terms(sentence) for sentence in sentences]
+    title_terms = set(content_terms(title or ''))
+    counts = Counter()
+    for terms in sentence_terms:
+        counts.update(terms)
+    counts.update(title_terms)
+    return Document(sentences, sentence_terms, title_terms, dict(counts))
+
+
+def rank(document, frequencies=None, max_keywords=MAX_KEYWORDS, max_sentences=SUMMARY_SENTENCES):
+    """Returnerer (nøgleord, resumé) for en artikel fra prepare().
+
+    Nøgleord og resumé har samme form som newspapers Article.nlp(): en liste
+    af ord og de valgte sætninger adskilt af linjeskift.
+    """
+    total = sum(document.counts.values())
+    if not total:
+        return [], ''
+    frequencies = frequencies or get_document_frequencies()
+    idf = frequencies.idf
+    weights = {term: count / total * idf(term) for term, count in document.counts.items()}
+    for term in document.title_terms:
+        weights[term] *= TITLE_BOOST
+    keywords = sorted(weights, key=lambda term: (-weights[term], term))[:max_keywords]
+
+    # Unikke ords samlede vægt pr. sætning, normeret for længde og med en
+    # lille bonus til tidlige sætninger (nyhedsartikler starter med det vigtigste).
+    # Gentagne sætninger (fx faste bokse i brødteksten) tæller kun første gang.
+    sentences = document.sentences
+    n = len(sentences)
+    scored = []
+    seen = set()
+    for i, terms in enumerate(document.sentence_terms):
+        if len(terms) < MIN_SENTENCE_TERMS:
+            continue
+        normalized = ' '.join(sentences[i].split()).casefold()
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        unique = set(terms)
+        score = sum(map(weights.__getitem__, unique)) / math.sqrt(len(unique))
+        scored.append((score * (1.0 + 0.3 * (1 - i / n)), i))
+    chosen = sorted(i for _, i in sorted(scored, reverse=True)[:max_sentences])
+    summary = '\n'.join(sentences[i] for i in chosen)
+    return keywords, summary
+
+
+def extract(title, text, frequencies=None, max_keywords=MAX_KEYWORDS,
+            max_sentences=SUMMARY_SENTENCES):
+    """Returnerer (nøgleord, resumé, artiklens unikke ord) i ét trin"""
+    document = prepare(title, text)
+    found, summary = rank(document, frequencies, max_keywords, max_sentences)
+    return found, summary, document.terms
+
+
+def record_document(terms):
+    """Tæller en analyseret artikels ord med i dokumentfrekvenserne"""
+    if terms:
+        get_document_frequencies().add(terms)
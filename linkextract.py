@@ -0,0 +1,72 @@
+"""Inkrementel udtrækning af links fra HTML der modtages i bidder"""
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# Linktekst længere end dette klippes, så et enkelt link ikke kan fylde hukommelsen
+MAX_TITLE_CHARS = 500
+
+
+class LinkExtractor(HTMLParser):
+    """Samler <a href>-links og deres tekst, indtil der er nok der opfylder accept"""
+
+    def __init__(self, base_url, accept=None, limit=10):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.accept = accept
+        self.limit = limit
+        self.links = []
+        self._href = None
+        self._text = []
+        self._text_len = 0
+
+    @property
+    def done(self):
+        return len(self.links) >= self.limit
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'base':
+            href = dict(attrs).get('href')
+            if href:
+                self.base_url = urljoin(self.base_url, href.strip())
+        elif tag == 'a':
+            # Et nyt <a> afslutter et evt. uafsluttet link
+            if self._href is not None:
+                self._finish()
+            href = dict(attrs).get('href')
+            if href and href.strip():
+                self._href = urljoin(self.base_url, href.strip())
+                self._text = []
+                self._text_len = 0
+
+    def handle_data(self, data):
+        if self._href is not None and self._text_len < MAX_TITLE_CHARS:
+            self._text.append(data)
+            self._text_len += len(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._href is not None:
+            self._finish()
+
+    def _finish(self):
+        href = self._href
+        self._href = None
+        if self.done or (self.accept is not None and not self.accept(href)):
+            return
+        title = ''.join(self._text)[:MAX_TITLE_CHARS].strip()
+        self.links.append({'url': href, 'title': title})
+
+
+def extract_links(chunks, base_url, accept=None, limit=10):
+    """Returnerer op til limit links fra en strøm af tekstbidder.
+
+    Relative links gøres absolutte ud fra base_url. Parsingen stopper, så snart
+    der er fundet nok links, og resten af strømmen læses ikke.
+    """
+    parser = LinkExtractor(base_url, accept, limit)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.links
@@ -0,0 +1,178 @@
+"""Tællere og histogrammer til drift, eksporteret i Prometheus' tekstformat"""
+import math
+import threading
+
+# Sekunder; dækker alt fra cache-hits til langsomme medier
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Tæller der kun kan stige, evt. opdelt på labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name + _format_labels(self.labels, key), value
+
+
+class Histogram:
+    """Fordeling af målinger i faste spande (kumulativt som i Prometheus)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, [('le', _format_value(bound))])
+                yield f'{self.name}_bucket{labels}', cumulative
+            yield f'{self.name}_sum{_format_labels(self.labels, key)}', total
+            yield f'{self.name}_count{_format_labels(self.labels, key)}', count
+
+
+class Gauge:
+    """Øjebliksværdier der aflæses ved eksport via en funktion.
+
+    Funktionen returnerer enten et tal eller {label-værdier: tal}.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, read, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.read = read
+
+    def samples(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            if not isinstance(key, tuple):
+                key = (key,)
+            yield self.name + _format_labels(self.labels, key), value
+
+
+class Registry:
+    """Samling af metrikker med eksport i Prometheus' tekstformat"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metrikken {metric.name} findes allerede')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, read, labels=()):
+        return self.register(Gauge(name, help, read, labels))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {_escape(metric.help)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, value in metric.samples():
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+ANALYZE_STAGE_SECONDS = REGISTRY.histogram(
+    'mediekompasset_analyze_stage_seconds',
+    'Varighed af hvert trin i artikelanalysen',
+    labels=('stage',)
+)
+FETCH_SECONDS = REGISTRY.histogram(
+    'mediekompasset_fetch_seconds',
+    'Varighed af hentning og udtræk af en forside pr. medie',
+    labels=('source',)
+)
+FETCH_BYTES = REGISTRY.counter(
+    'mediekompasset_fetch_bytes_total',
+    'Modtagne bytes fra forsider pr. medie',
+    labels=('source',)
+)
+FETCH_ERRORS = REGISTRY.counter(
+    'mediekompasset_fetch_errors_total',
+    'Fejlede hentninger af forsider pr. medie og fejltype',
+    labels=('source', 'kind')
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'mediekompasset_request_seconds',
+    'Svartid pr. route (til første byte for streamede svar)',
+    labels=('route', 'method', 'status')
+)
@@ -0,0 +1,298 @@
+"""Høflig hentning: grænser pr. vært, robots.txt og circuit breakers pr. medie"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from download import CHUNK_SIZE, limit_bytes
+
+HOST_CONCURRENCY = int(os.getenv('POLITE_HOST_CONCURRENCY', '2'))
+MIN_INTERVAL = float(os.getenv('POLITE_MIN_INTERVAL', '1'))
+RESPECT_ROBOTS = os.getenv('POLITE_ROBOTS', '1') == '1'
+ROBOTS_TTL = float(os.getenv('POLITE_ROBOTS_TTL', '86400'))
+ROBOTS_MAX_BYTES = int(os.getenv('POLITE_ROBOTS_MAX_BYTES', str(512 * 1024)))
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', '3'))
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', '30'))
+BREAKER_MAX_COOLDOWN = float(os.getenv('BREAKER_MAX_COOLDOWN', '900'))
+
+# Svar der betyder at værten vil have os til at sænke farten
+BACKOFF_STATUS = (429, 503)
+
+
+class Throttled(Exception):
+    """Værten kunne ikke få en ledig plads inden for fristen"""
+
+
+def retry_after(value, now=None):
+    """Sekunder fra en Retry-After header (sekunder eller HTTP-dato), eller None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, moment.timestamp() - now)
+
+
+class CircuitBreaker:
+    """Breaker for én kilde: lukket -> åben efter gentagne fejl -> halvåben prøve.
+
+    Mens breakeren er åben, springes kilden straks over. Når ventetiden er
+    gået, slippes én prøve igennem; lykkes den, lukkes breakeren, ellers
+    åbnes den igen med dobbelt så lang ventetid (op til et loft).
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN,
+                 max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.threshold = failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.opened_until = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Om der må sendes en request nu; i halvåben tilstand kun én ad gangen"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() >= self.opened_until:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self.opened_until = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open':
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == 'closed' and self.failures >= self.threshold:
+                self._open()
+
+    def release(self):
+        """Afslutter en prøve der hverken lykkedes eller fejlede (fx ved throttling)"""
+        with self._lock:
+            self._probing = False
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_until = time.monotonic() + self.cooldown
+        self._probing = False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = round(max(0.0, self.opened_until - time.monotonic()), 1)
+            return {'state': self.state, 'failures': self.failures, 'retry_in_s': retry_in}
+
+
+class _Host:
+    def __init__(self, concurrency):
+        self.slots = threading.BoundedSemaphore(concurrency)
+        # Oprettes først i event-loopet (Python 3.9 binder semaforen til loopet)
+        self.async_slots = None
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+        self.backoff = 0.0
+        self.robots = None
+        self.robots_fetched = None
+        # Sat mens én tråd henter robots.txt; de andre venter på den
+        self.robots_pending = None
+
+
+class HostScheduler:
+    """Begrænser samtidige requests og takten pr. vært og overholder robots.txt.
+
+    Afstanden mellem to requests til samme vært er den største af
+    min_interval og robots.txt's Crawl-delay. Svar med 429/503 skubber
+    værtens næste request ud efter Retry-After eller med eksponentiel backoff.
+    """
+
+    def __init__(self, get_session, user_agent, concurrency=HOST_CONCURRENCY,
+                 min_interval=MIN_INTERVAL, respect_robots=RESPECT_ROBOTS,
+                 robots_ttl=ROBOTS_TTL, timeout=(3.05, 5)):
+        self.get_session = get_session
+        self.user_agent = user_agent
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.respect_robots = respect_robots
+        self.robots_ttl = robots_ttl
+        self.timeout = timeout
+        self._hosts = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        netloc = urlsplit(url).netloc.lower()
+        with self._lock:
+            host = self._hosts.get(netloc)
+            if host is None:
+                host = self._hosts[netloc] = _Host(self.concurrency)
+            return host
+
+    def breaker(self, source):
+        with self._lock:
+            breaker = self._breakers.get(source)
+            if breaker is None:
+                breaker = self._breakers[source] = CircuitBreaker()
+            return breaker
+
+    def breakers(self):
+        """Breakerens tilstand for hver kilde der er blevet hentet"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {source: breaker.snapshot() for source, breaker in breakers.items()}
+
+    def _robots(self, url, host, until=None):
+        """Returnerer (og cacher) værtens robots.txt; None hvis den ikke kunne hentes.
+
+        Kun én tråd henter filen pr. vært; de andre venter på den inden for
+        deres frist. until er den monotone frist for hele hentningen.
+        """
+        with host.lock:
+            fresh = host.robots_fetched is not None and \
+                time.monotonic() - host.robots_fetched < self.robots_ttl
+            if fresh:
+                return host.robots
+            pending = host.robots_pending
+            if pending is None:
+                host.robots_pending = threading.Event()
+        if pending is not None:
+            pending.wait(None if until is None else max(0.0, until - time.monotonic()))
+            return host.robots
+
+        parts = urlsplit(url)
+        robots_url = f'{parts.scheme}://{parts.netloc}/robots.txt'
+        parser = None
+        fetched = True
+        try:
+            parser = self._fetch_robots(robots_url, until)
+        except Throttled:
+            # Ingen tid tilbage: brug den gamle robots.txt (eller tillad alt), men gem intet
+            fetched = False
+            parser = host.robots
+        except Exception as e:
+            # Uden robots.txt hentes som om alt er tilladt
+            print(f"Kunne ikke hente {robots_url}: {str(e)}")
+            parser = None
+        with host.lock:
+            if fetched:
+                host.robots = parser
+                host.robots_fetched = time.monotonic()
+            host.robots_pending.set()
+            host.robots_pending = None
+        return parser
+
+    def _fetch_robots(self, robots_url, until=None):
+        timeout = self.timeout
+        if until is not None:
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                raise Throttled('Fristen udløb før robots.txt kunne hentes')
+            timeout = tuple(min(part, remaining) for part in timeout)
+        with self.get_session().get(robots_url, timeout=timeout, stream=True) as response:
+            parser = RobotFileParser(robots_url)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                body = b''.join(limit_bytes(response.iter_content(CHUNK_SIZE), ROBOTS_MAX_BYTES))
+                parser.parse(body.decode('utf-8', 'replace').splitlines())
+        return parser
+
+    def allowed(self, url, until=None):
+        """Om robots.txt tillader at hente url; until er den monotone frist"""
+        if not self.respect_robots:
+            return True
+        robots = self._robots(url, self._host(url), until)
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    def _interval(self, host):
+        delay = None
+        if self.respect_robots and host.robots is not None:
+            delay = host.robots.crawl_delay(self.user_agent)
+        return max(self.min_interval, float(delay or 0))
+
+    def _reserve(self, url, host, deadline):
+        """Reserverer værtens næste starttidspunkt og returnerer det (monotont)"""
+        with host.lock:
+            now = time.monotonic()
+            start = max(now, host.next_start)
+            if start > deadline:
+                raise Throttled(f'{urlsplit(url).netloc} må først kontaktes om {start - now:.1f} s')
+            host.next_start = start + self._interval(host)
+        return start
+
+    @contextmanager
+    def slot(self, url, timeout):
+        """Venter på en ledig plads hos værten; kaster Throttled hvis fristen overskrides"""
+        host = self._host(url)
+        deadline = time.monotonic() + timeout
+        if not host.slots.acquire(timeout=max(0.0, timeout)):
+            raise Throttled(f'Ingen ledig forbindelse til {urlsplit(url).netloc}')
+        try:
+            start = self._reserve(url, host, deadline)
+            if start > time.monotonic():
+                time.sleep(start - time.monotonic())
+            yield
+        finally:
+            host.slots.release()
+
+    @asynccontextmanager
+    async def aslot(self, url, timeout):
+        """Som slot, men venter uden at blokere event-loopet"""
+        host = self._host(url)
+        deadline = time.monotonic() + timeout
+        if host.async_slots is None:
+            host.async_slots = asyncio.Semaphore(self.concurrency)
+        try:
+            await asyncio.wait_for(host.async_slots.acquire(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            raise Throttled(f'Ingen ledig forbindelse til {urlsplit(url).netloc}') from None
+        try:
+            start = self._reserve(url, host, deadline)
+            if start > time.monotonic():
+                await asyncio.sleep(start - time.monotonic())
+            yield
+        finally:
+            host.async_slots.release()
+
+    def succeeded(self, url):
+        host = self._host(url)
+        with host.lock:
+            host.backoff = 0.0
+
+    def back_off(self, url, delay=None):
+        """Skubber værtens næste request ud efter Retry-After eller eksponentielt"""
+        host = self._host(url)
+        with host.lock:
+            if delay is None:
+                host.backoff = min(max(host.backoff * 2, self.min_interval, 1.0), BREAKER_MAX_COOLDOWN)
+                delay = host.backoff
+            delay = min(delay, BREAKER_MAX_COOLDOWN)
+            host.next_start = max(host.next_start, time.monotonic() + delay)
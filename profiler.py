@@ -0,0 +1,88 @@
+"""Samplende profilering af enkelte requests.
+
+En baggrundstråd aflæser med faste mellemrum stakken for den tråd der
+behandler requesten og tæller hvor ofte hver stak ses. Resultatet gemmes i
+"collapsed stack"-formatet, som fx flamegraph.pl og speedscope kan læse.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+MAX_DEPTH = 64
+
+
+def _stack(frame):
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Sampler stakken for én tråd indtil stop() kaldes"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._started = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[_stack(frame)] += 1
+            self.samples += 1
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def collapsed(self):
+        header = (
+            f'# {self.samples} samples, interval {self.interval * 1000:g} ms, '
+            f'varighed {self.duration * 1000:.1f} ms\n'
+        )
+        return header + ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.most_common()
+        )
+
+
+class ProfileStore:
+    """De seneste profiler i hukommelsen, slået op på id"""
+
+    def __init__(self, keep=PROFILE_KEEP):
+        self.keep = keep
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, text):
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._profiles[profile_id] = text
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
@@ -0,0 +1,152 @@
+"""Kompakte poster for skrabede links og analyser samt kolonneformat til store svar.
+
+Links og analyser holdes i hukommelsen som objekter med __slots__ i stedet
+for dicts, og mediet gemmes som et id i SOURCE_IDS (samme rækkefølge som
+MEDIA_SOURCES) i stedet for en kopi af navnet pr. link. Til JSON-svar
+omdannes de til de samme dicts som før, eller med columnar() til kolonner.
+"""
+import threading
+
+
+class SourceTable:
+    """Tildeler hvert medienavn et fast, lille heltals-id"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self._ids = {}
+        self._lock = threading.Lock()
+        self.register(names)
+
+    def register(self, names):
+        for name in names:
+            self.id(name)
+
+    def id(self, name):
+        if name is None:
+            return None
+        source_id = self._ids.get(name)
+        if source_id is None:
+            with self._lock:
+                source_id = self._ids.get(name)
+                if source_id is None:
+                    source_id = self._ids[name] = len(self.names)
+                    self.names.append(name)
+        return source_id
+
+    def name(self, source_id):
+        return None if source_id is None else self.names[source_id]
+
+
+# Fælles tabel; app.py registrerer MEDIA_SOURCES først, så id'erne er deres indeks
+SOURCE_IDS = SourceTable()
+
+
+class Link:
+    """Et skrabet link: medie-id, URL, titel og (fra feeds) udgivelsesdato"""
+
+    __slots__ = ('source_id', 'url', 'title', 'published')
+
+    def __init__(self, source, url, title, published=None):
+        self.source_id = SOURCE_IDS.id(source)
+        self.url = url
+        self.title = title
+        self.published = published
+
+    @property
+    def source(self):
+        return SOURCE_IDS.name(self.source_id)
+
+    def to_dict(self):
+        data = {'source': self.source, 'url': self.url, 'title': self.title}
+        if self.published:
+            data['published'] = self.published
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('source'), data['url'], data.get('title'), data.get('published'))
+
+
+class AnalysisRecord:
+    """En analyse som i svaret fra /api/analyze; ukendte felter bevares i extra"""
+
+    __slots__ = ('title', 'publish_date', 'sentiment_label', 'sentiment_score', 'sources_count',
+                 'keywords', 'summary', 'extra')
+
+    FIELDS = ('title', 'publish_date', 'sentiment', 'sources_count', 'keywords', 'summary')
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls()
+        sentiment = data.get('sentiment')
+        record.title = data.get('title')
+        record.publish_date = data.get('publish_date')
+        record.sentiment_label = None if sentiment is None else sentiment.get('label')
+        record.sentiment_score = None if sentiment is None else sentiment.get('score')
+        record.sources_count = data.get('sources_count')
+        keywords = data.get('keywords')
+        record.keywords = None if keywords is None else tuple(keywords)
+        record.summary = data.get('summary')
+        extra = {key: value for key, value in data.items() if key not in cls.FIELDS}
+        record.extra = extra or None
+        return record
+
+    def to_dict(self):
+        data = {
+            'title': self.title,
+            'publish_date': self.publish_date,
+            'sentiment': (
+                None if self.sentiment_label is None and self.sentiment_score is None
+                else {'label': self.sentiment_label, 'score': self.sentiment_score}
+            ),
+            'sources_count': self.sources_count,
+            'keywords': None if self.keywords is None else list(self.keywords),
+            'summary': self.summary
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def columnar(rows, fields=None, dictionary=('source', 'category')):
+    """Omdanner en liste af dicts til kolonner.
+
+    Felter i dictionary (få forskellige værdier) kodes som indeks i en liste
+    under 'dictionaries', så fx et medienavn kun står én gang i svaret.
+    """
+    rows = list(rows)
+    if fields is None:
+        fields = list(rows[0]) if rows else []
+    columns = {}
+    dictionaries = {}
+    for field in fields:
+        values = [row.get(field) for row in rows]
+        if field in dictionary:
+            index = {}
+            columns[field] = [None if value is None else index.setdefault(value, len(index)) for value in values]
+            dictionaries[field] = list(index)
+        else:
+            columns[field] = values
+    return {
+        'format': 'columnar',
+        'count': len(rows),
+        'fields': list(fields),
+        'columns': columns,
+        'dictionaries': dictionaries
+    }
+
+
+def columnar_links(links):
+    """Som columnar() for Link-poster, men direkte fra felterne og med SOURCE_IDS som ordbog"""
+    return {
+        'format': 'columnar',
+        'count': len(links),
+        'fields': ['source', 'url', 'title', 'published'],
+        'columns': {
+            'source': [link.source_id for link in links],
+            'url': [link.url for link in links],
+            'title': [link.title for link in links],
+            'published': [link.published for link in links]
+        },
+        'dictionaries': {'source': list(SOURCE_IDS.names)}
+    }
@@ -0,0 +1,169 @@
+"""Fælles lag for JSON-svar: hurtig kodning, komprimering og paginering.
+
+Kodningen bruger orjson, hvis det er installeret, og ellers json fra
+standardbiblioteket med samme output. Datoer kodes altid af json_default
+(ISO 8601), så svaret ikke afhænger af hvilken koder der er i brug.
+Svar over JSON_COMPRESS_MIN_BYTES komprimeres med brotli (hvis
+installeret) eller gzip efter klientens Accept-Encoding.
+"""
+import base64
+import gzip
+import json
+import os
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_COMPRESS_MIN_BYTES = int(os.getenv('JSON_COMPRESS_MIN_BYTES', '1024'))
+JSON_GZIP_LEVEL = int(os.getenv('JSON_GZIP_LEVEL', '6'))
+JSON_BROTLI_QUALITY = int(os.getenv('JSON_BROTLI_QUALITY', '5'))
+PAGE_MAX_LIMIT = int(os.getenv('PAGE_MAX_LIMIT', '500'))
+
+# Medietyper der komprimeres; streams (NDJSON, SSE) sendes bid for bid og røres ikke
+COMPRESSIBLE_TYPES = frozenset({'application/json'})
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def json_default(value):
+    """Koder værdier JSON ikke kender: datoer som ISO 8601, mængder som lister.
+
+    Tidspunkter uden tidszone (fx publish_date fra newspaper) kodes uden
+    forskydning i stedet for at gætte på en.
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'Kan ikke serialisere {type(value).__name__}')
+
+
+def dumps(obj):
+    """Koder obj som kompakt UTF-8-JSON (bytes)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=json_default).encode('utf-8')
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flasks JSON-udbyder med dumps() ovenfor, så jsonify og app.json.dumps bruger den.
+
+    Nøglerne sorteres ikke; rækkefølgen er den svaret blev bygget i.
+    """
+
+    default = staticmethod(json_default)
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b'\n', mimetype=self.mimetype)
+
+
+def choose_encoding(accept):
+    """Vælger 'br', 'gzip' eller None ud fra en (werkzeug) Accept-Encoding"""
+    br = accept['br'] if brotli is not None else 0
+    gz = accept['gzip']
+    if br > 0 and br >= gz:
+        return 'br'
+    if gz > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=JSON_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=JSON_GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept, min_bytes=JSON_COMPRESS_MIN_BYTES):
+    """Komprimerer et færdigt JSON-svar, hvis det er stort nok og klienten vil.
+
+    Svar der allerede er komprimerede eller har deres egen ETag (som
+    /api/stats, der har færdigkomprimerede udgaver) lades være.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'Content-Encoding' in response.headers or 'ETag' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    encoding = choose_encoding(accept)
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Afkoder en cursor fra encode_cursor(); kaster ValueError hvis den er ugyldig"""
+    try:
+        return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    except (TypeError, ValueError) as e:
+        raise ValueError('Ugyldig cursor') from e
+
+
+def parse_limit(value):
+    """Læser ?limit= som heltal; mangler den eller er den ugyldig, gives None (som Flasks type=int)"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def page_limit(value, default=50):
+    """Begrænser ?limit= til 1..PAGE_MAX_LIMIT"""
+    return max(1, min(default if value is None else value, PAGE_MAX_LIMIT))
+
+
+def paginate(items, key, limit, cursor=None):
+    """Returnerer (side, næste cursor eller None) fra en liste i fast rækkefølge.
+
+    Cursoren peger på det sidste element på siden (key(element)), så næste
+    side starter efter det, selv om listen har fået nye elementer foran.
+    Findes elementet ikke længere, kastes ValueError.
+    """
+    start = 0
+    if cursor:
+        after = decode_cursor(cursor)
+        for index, item in enumerate(items):
+            if key(item) == after:
+                start = index + 1
+                break
+        else:
+            raise ValueError('Cursoren er udløbet; start forfra uden cursor')
+    page = items[start:start + limit]
+    next_cursor = encode_cursor(key(page[-1])) if page and start + limit < len(items) else None
+    return page, next_cursor
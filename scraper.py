@@ -0,0 +1,274 @@
+"""Samtidig hentning af forsider fra de fulgte medier"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as DeadlineExceeded
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from download import (
+    CHUNK_SIZE, FEED_TYPES, HTML_TYPES, TooLarge, UnsupportedContent, check_headers, iter_text, limit_bytes
+)
+from metrics import FETCH_BYTES, FETCH_ERRORS, FETCH_SECONDS, REGISTRY
+from politeness import BACKOFF_STATUS, HostScheduler, Throttled, retry_after
+
+# Indstillinger kan overskrives via miljøvariabler (.env)
+CONNECT_TIMEOUT = float(os.getenv('SCRAPE_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('SCRAPE_READ_TIMEOUT', '5'))
+DEADLINE = float(os.getenv('SCRAPE_DEADLINE', '8'))
+MAX_WORKERS = int(os.getenv('SCRAPE_WORKERS', '8'))
+POOL_SIZE = int(os.getenv('SCRAPE_POOL_SIZE', '4'))
+USER_AGENT = os.getenv('SCRAPE_USER_AGENT', 'Mediekompasset/1.0 (+https://github.com/scot00671234/Mediekompasset)')
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='scraper')
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returnerer en delt session med keep-alive forbindelser pr. vært"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Én pulje pr. vært; medierne ligger på hver deres domæne
+            adapter = HTTPAdapter(pool_connections=64, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+    return _session
+
+
+# Grænser pr. vært, robots.txt og circuit breakers pr. medie
+scheduler = HostScheduler(get_session, USER_AGENT, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+
+REGISTRY.gauge(
+    'mediekompasset_breaker_open',
+    'Om circuit breakeren for et medie er åben (1) eller halvåben (0.5)',
+    lambda: {
+        source: {'closed': 0, 'half_open': 0.5, 'open': 1}[state['state']]
+        for source, state in scheduler.breakers().items()
+    },
+    labels=('source',)
+)
+
+
+def _error_kind(error):
+    if isinstance(error, TooLarge):
+        return 'too_large'
+    if isinstance(error, UnsupportedContent):
+        return 'content_type'
+    if isinstance(error, requests.HTTPError):
+        return 'http'
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.ConnectionError):
+        return 'connection'
+    return 'other'
+
+
+# Validatorer (ETag/Last-Modified) og seneste artikler pr. feed, til betingede GET
+_feed_cache = {}
+_feed_cache_lock = threading.Lock()
+
+
+def conditional_headers(url):
+    """Headers til en betinget GET af et feed, der er hentet før"""
+    with _feed_cache_lock:
+        cached = _feed_cache.get(url)
+    headers = {}
+    if cached is not None:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
+
+
+def cached_feed(url):
+    """Artiklerne fra sidste hentning af et feed (ved 304 Not Modified)"""
+    with _feed_cache_lock:
+        cached = _feed_cache.get(url)
+    return None if cached is None else list(cached['articles'])
+
+
+def remember_feed(url, headers, articles):
+    """Gemmer feedets validatorer og artikler; feeds uden validatorer huskes ikke"""
+    etag = headers.get('ETag')
+    last_modified = headers.get('Last-Modified')
+    with _feed_cache_lock:
+        if etag or last_modified:
+            _feed_cache[url] = {'etag': etag, 'last_modified': last_modified, 'articles': articles}
+        else:
+            _feed_cache.pop(url, None)
+
+
+def _download(source, url, extract, until, feed):
+    """Henter én URL og kører udtrækket på svaret; returnerer (artikler, svar).
+
+    Feeds hentes betinget og gives til udtrækket som bytes (XML-parseren
+    læser selv tegnsættet); forsider gives som afkodet tekst. Begge har
+    loftet DOWNLOAD_MAX_BYTES; en forside over loftet klippes blot af.
+    """
+    headers = conditional_headers(url) if feed else {}
+    with scheduler.slot(url, until - time.monotonic()):
+        with get_session().get(url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True,
+                               headers=headers) as response:
+            try:
+                if response.status_code in BACKOFF_STATUS:
+                    scheduler.back_off(url, retry_after(response.headers.get('Retry-After')))
+                if response.status_code == 304 and headers:
+                    articles = cached_feed(url)
+                    if articles is not None:
+                        return articles, response
+                response.raise_for_status()
+                chunks = response.iter_content(CHUNK_SIZE)
+                if feed:
+                    check_headers(response.headers, FEED_TYPES)
+                    articles = extract(source, response.url, limit_bytes(chunks), kind='feed')
+                    remember_feed(url, response.headers, articles)
+                else:
+                    check_headers(response.headers, HTML_TYPES, max_bytes=None)
+                    text = iter_text(chunks, response.headers.get('Content-Type'), truncate=True)
+                    articles = extract(source, response.url, text)
+            finally:
+                # Bytes læst fra forbindelsen; udtrækket kan stoppe før hele siden er hentet
+                FETCH_BYTES.inc(response.raw.tell(), source=source)
+    return articles, response
+
+
+def _fetch_source(source, url, extract, until=None, feeds=()):
+    """Finder en kildes seneste artikler og kører udtrækket på svaret, mens det streames.
+
+    Kildens feeds og sitemaps prøves først i rækkefølge; giver ingen af dem
+    artikler, hentes forsiden. Kilder med åben circuit breaker springes over
+    uden netværkskald, og URL'er som robots.txt ikke tillader springes over.
+    until er den monotone frist for at få en plads hos værten.
+    """
+    started = time.monotonic()
+    until = started + DEADLINE if until is None else until
+    breaker = scheduler.breaker(source)
+    if not breaker.allow():
+        return [], {'status': 'circuit_open', 'elapsed_ms': 0, 'breaker': breaker.snapshot()}
+
+    failure = None
+    errors = []
+    for target, feed in [(feed_url, True) for feed_url in feeds] + [(url, False)]:
+        if not scheduler.allowed(target, until):
+            errors.append(f'{target}: ikke tilladt af robots.txt')
+            continue
+        try:
+            articles, response = _download(source, target, extract, until, feed)
+        except Throttled as e:
+            # Vi holdt selv igen; det tæller ikke som en fejl hos mediet
+            failure = failure or ('throttled', e)
+            errors.append(f'{target}: {str(e)}')
+            continue
+        except Exception as e:
+            print(f"Fejl ved hentning af {source} ({target}): {str(e)}")
+            FETCH_ERRORS.inc(source=source, kind=_error_kind(e))
+            failure = ('error', e)
+            errors.append(f'{target}: {str(e)}')
+            continue
+        if feed and not articles:
+            errors.append(f'{target}: ingen artikler')
+            continue
+        scheduler.succeeded(target)
+        break
+    else:
+        elapsed = time.monotonic() - started
+        if failure is None:
+            # Alle URL'er blev afvist af robots.txt
+            breaker.release()
+            return [], {
+                'status': 'disallowed',
+                'elapsed_ms': round(elapsed * 1000),
+                'breaker': breaker.snapshot()
+            }
+        kind, error = failure
+        if kind == 'throttled':
+            breaker.release()
+        else:
+            breaker.record_failure()
+            FETCH_SECONDS.observe(elapsed, source=source)
+        return [], {
+            'status': kind,
+            'error': '; '.join(errors),
+            'elapsed_ms': round(elapsed * 1000),
+            'breaker': breaker.snapshot()
+        }
+
+    elapsed = time.monotonic() - started
+    breaker.record_success()
+    FETCH_SECONDS.observe(elapsed, source=source)
+    status = {
+        'status': 'ok',
+        'via': 'feed' if feed else 'homepage',
+        'url': target,
+        'http_status': response.status_code,
+        'elapsed_ms': round(elapsed * 1000),
+        'count': len(articles),
+        'breaker': breaker.snapshot()
+    }
+    if response.status_code == 304:
+        status['not_modified'] = True
+    if errors:
+        status['fallback_errors'] = errors
+    return articles, status
+
+
+def iter_fetch(sources, extract, deadline=None, feeds=None):
+    """Giver (kilde, artikler, status) for hver kilde, så snart den er færdig.
+
+    feeds er kilde -> liste af feed- og sitemap-URL'er, der prøves før
+    forsiden. Kilder der ikke nåede at svare før den samlede frist gives
+    til sidst med status 'timeout' og ingen artikler.
+    """
+    deadline = DEADLINE if deadline is None else deadline
+    until = time.monotonic() + deadline
+    feeds = feeds or {}
+    futures = {
+        _executor.submit(_fetch_source, source, url, extract, until, feeds.get(source, ())): source
+        for source, url in sources.items()
+    }
+    finished = set()
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            finished.add(future)
+            articles, status = future.result()
+            yield futures[future], articles, status
+    except DeadlineExceeded:
+        pass
+
+    for future, source in futures.items():
+        if future in finished:
+            continue
+        if future.done():
+            articles, status = future.result()
+            yield source, articles, status
+            continue
+        # Kørende hentninger afbrydes af deres egne timeouts
+        future.cancel()
+        FETCH_ERRORS.inc(source=source, kind='deadline')
+        yield source, [], {
+            'status': 'timeout',
+            'elapsed_ms': round(deadline * 1000),
+            'breaker': scheduler.breaker(source).snapshot()
+        }
+
+
+def fetch_all(sources, extract, deadline=None, feeds=None):
+    """Henter alle kilder samtidigt inden for en samlet frist.
+
+    Returnerer (artikler pr. kilde, status pr. kilde). Kilder der ikke nåede
+    at svare før fristen markeres med status 'timeout' og giver ingen artikler.
+    """
+    results = {}
+    status = {}
+    for source, articles, source_status in iter_fetch(sources, extract, deadline, feeds):
+        results[source] = articles
+        status[source] = source_status
+    return results, status
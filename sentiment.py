@@ -0,0 +1,126 @@
+"""Dansk sentimentanalyse baseret på et vægtet leksikon"""
+import os
+import re
+import threading
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sentiment_da.tsv')
+
+# Ord der vender fortegnet på det næste sentimentudtryk inden for vinduet
+NEGATIONS = frozenset({'ikke', 'aldrig', 'ingen', 'intet', 'hverken', 'næppe', 'uden'})
+NEGATION_WINDOW = 3
+# Ord der afslutter en negation: 'ikke, men god' er ikke negativt
+NEGATION_BREAKS = frozenset({'men'})
+
+# Bogstavsekvenser, evt. med bindestreg; tal og tegnsætning indgår ikke
+TOKEN_RE = re.compile(r'[^\W\d_]+(?:-[^\W\d_]+)*')
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def tokenize(text):
+    """Deler en tekst op i små bogstavord uden tegnsætning"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class Lexicon:
+    """Kompileret leksikon.
+
+    Enkeltord ligger i et hash-opslag. Fraser ligger pr. første ord, længste
+    først, så en frase vinder over de enkeltord den består af.
+    """
+
+    def __init__(self, entries):
+        self.words = {}
+        self.phrases = {}
+        for expression, weight in entries:
+            tokens = tokenize(expression)
+            if len(tokens) == 1:
+                self.words[tokens[0]] = weight
+            elif tokens:
+                self.phrases.setdefault(tokens[0], []).append((tokens, weight))
+        for candidates in self.phrases.values():
+            candidates.sort(key=lambda candidate: len(candidate[0]), reverse=True)
+
+    @classmethod
+    def load(cls, path=LEXICON_PATH):
+        """Indlæser et leksikon fra en TSV-fil med linjer 'udtryk<TAB>vægt'"""
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                expression, weight = line.rsplit('\t', 1)
+                entries.append((expression, float(weight)))
+        return cls(entries)
+
+    def score_tokens(self, tokens):
+        """Returnerer (positiv vægt, negativ vægt) for en tokenliste"""
+        words = self.words
+        phrases = self.phrases
+        positive = negative = 0.0
+        negate_until = -1
+        i = 0
+        n = len(tokens)
+        while i < n:
+            token = tokens[i]
+            if token in NEGATIONS:
+                negate_until = i + NEGATION_WINDOW
+                i += 1
+                continue
+            if token in NEGATION_BREAKS:
+                negate_until = -1
+                i += 1
+                continue
+
+            weight = None
+            length = 1
+            candidates = phrases.get(token)
+            if candidates:
+                for phrase, phrase_weight in candidates:
+                    if tokens[i:i + len(phrase)] == phrase:
+                        weight = phrase_weight
+                        length = len(phrase)
+                        break
+            if weight is None:
+                weight = words.get(token)
+
+            if weight is not None:
+                if i <= negate_until:
+                    weight = -weight
+                    negate_until = -1
+                if weight > 0:
+                    positive += weight
+                else:
+                    negative -= weight
+            i += length
+        return positive, negative
+
+
+def get_lexicon():
+    """Returnerer det delte leksikon, som indlæses ved første brug"""
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                _lexicon = Lexicon.load()
+    return _lexicon
+
+
+def _result(positive, negative):
+    total = positive + negative
+    value = (positive - negative) / total if total else 0
+    if value > 0:
+        label = 'positiv'
+    elif value < 0:
+        label = 'negativ'
+    else:
+        label = 'neutral'
+    return {'label': label, 'score': abs(value)}
+
+
+def score(text):
+    """Sentiment for én tekst som {'label', 'score'}"""
+    return _result(*get_lexicon().score_tokens(tokenize(text)))
+
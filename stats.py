@@ -0,0 +1,146 @@
+"""Forudberegnet statistik over medierne til /api/stats"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MEDIA_STATS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'media_stats.json')
+# Antal forskellige ?fields=-kombinationer der huskes
+MAX_ENCODED_VARIANTS = 256
+# Løbende tal: hvor ofte de flettes ind, hvilket vindue der bruges til
+# topic_coverage, og hvor mange artikler der kræves før det sker
+STATS_LIVE_REFRESH = float(os.getenv('STATS_LIVE_REFRESH', '30'))
+STATS_LIVE_WINDOW = os.getenv('STATS_LIVE_WINDOW', '7d')
+STATS_LIVE_MIN_ARTICLES = int(os.getenv('STATS_LIVE_MIN_ARTICLES', '20'))
+
+
+def load_media_stats(path=MEDIA_STATS_PATH):
+    """Indlæser mediestatistikken fra datafilen"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Encoded:
+    """Et færdigt svar: JSON-bytes, gzip-udgave og stærke ETags for begge"""
+
+    def __init__(self, payload):
+        # Nøglerne sorteres ikke: rækkefølgen af medier og kategorier er den i datafilen
+        # og MEDIA_CATEGORIES (frontenden viser fanerne i den rækkefølge)
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = digest
+        self.gzip_etag = f'{digest}-gzip'
+
+
+class _Snapshot:
+    """Én udgave af statistikken med indeks og færdigkodede svar"""
+
+    def __init__(self, media_stats, categories, category_stats):
+        self.media_stats = media_stats
+        self.categories = categories
+        self.category_stats = category_stats
+        self.fields = frozenset(field for stats in media_stats.values() for field in stats)
+        self.by_category = {}
+        for name, stats in media_stats.items():
+            self.by_category.setdefault(stats.get('category'), []).append(name)
+        self.base = {
+            category: Encoded(self.build(category, None))
+            for category in [None, *self.by_category]
+        }
+        self.variants = OrderedDict()
+
+    def build(self, category, fields):
+        names = self.media_stats if category is None else self.by_category.get(category, [])
+        media_stats = {}
+        for name in names:
+            stats = self.media_stats[name]
+            media_stats[name] = stats if fields is None else {
+                field: stats[field] for field in fields if field in stats
+            }
+        payload = {'media_stats': media_stats, 'categories': self.categories}
+        if self.category_stats:
+            payload['category_stats'] = (
+                self.category_stats if category is None
+                else {category: self.category_stats.get(category, {})}
+            )
+        return payload
+
+
+class StatsPayload:
+    """Statistikken kodet én gang ved opstart, med indeks pr. kategori.
+
+    Svar for hver kategori er forudberegnet; ?fields=-udsnit kodes første gang
+    de efterspørges og huskes derefter. Løbende tal fra aggregaterne flettes
+    ind med refresh_live(), højst én gang pr. STATS_LIVE_REFRESH sekunder.
+    """
+
+    def __init__(self, media_stats, categories):
+        self.static_stats = media_stats
+        self.categories = categories
+        self.live_version = None
+        self._live_published = None
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot(media_stats, categories, {})
+
+    def refresh_live(self, version, summarize):
+        """Fletter løbende tal ind hvis de har ændret sig og intervallet er gået.
+
+        summarize() skal returnere (pr. medie, pr. kategori) med en
+        opsummering pr. tidsvindue, som Aggregator.summary().
+        """
+        now = time.monotonic()
+        if version == self.live_version:
+            return
+        if self._live_published is not None and now - self._live_published < STATS_LIVE_REFRESH:
+            return
+        with self._lock:
+            if version == self.live_version:
+                return
+            outlets, categories = summarize()
+            media_stats = {}
+            for name, stats in self.static_stats.items():
+                live = outlets.get(name)
+                if not live:
+                    media_stats[name] = stats
+                    continue
+                stats = dict(stats, live=live)
+                window = live.get(STATS_LIVE_WINDOW) or {}
+                # Erstat de håndtastede emneandele, når der er data nok
+                if window.get('articles', 0) >= STATS_LIVE_MIN_ARTICLES and window.get('topic_coverage'):
+                    stats['topic_coverage'] = window['topic_coverage']
+                media_stats[name] = stats
+            self._snapshot = _Snapshot(media_stats, self.categories, categories)
+            self.live_version = version
+            self._live_published = now
+
+    def encoded(self, category=None, fields=None):
+        """Returnerer det kodede svar for en kategori og evt. et udsnit af felter.
+
+        Kaster ValueError ved ukendte kategorier eller felter.
+        """
+        snapshot = self._snapshot
+        if category is not None and category not in snapshot.by_category:
+            raise ValueError(f'Ukendt kategori: {category}')
+        if fields is None:
+            return snapshot.base[category]
+        fields = tuple(sorted(set(fields)))
+        unknown = [field for field in fields if field not in snapshot.fields]
+        if unknown:
+            raise ValueError(f'Ukendte felter: {", ".join(unknown)}')
+
+        key = (category, fields)
+        with self._lock:
+            encoded = snapshot.variants.get(key)
+            if encoded is not None:
+                snapshot.variants.move_to_end(key)
+                return encoded
+        encoded = Encoded(snapshot.build(category, fields))
+        with self._lock:
+            snapshot.variants[key] = encoded
+            while len(snapshot.variants) > MAX_ENCODED_VARIANTS:
+                snapshot.variants.popitem(last=False)
+        return encoded
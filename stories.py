@@ -0,0 +1,271 @@
+"""Samler artikler om samme historie på tværs af medier.
+
+Hver analyseret artikel får et MinHash-fingeraftryk af titel og resumé, som
+lægges i et LSH-indeks (locality-sensitive hashing). En ny artikel
+sammenlignes kun med artikler der deler mindst ét bånd af fingeraftrykket,
+så det ikke bliver dyrere at finde historien jo flere artikler der er set.
+Indekset har et loft over antal historier og glemmer historier, der ikke
+har fået nye artikler inden for STORY_MAX_AGE.
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from sentiment import tokenize
+from urltools import canonicalize_url
+
+STORY_PERMUTATIONS = int(os.getenv('STORY_PERMUTATIONS', '64'))
+STORY_BANDS = int(os.getenv('STORY_BANDS', '32'))
+STORY_SIMILARITY = float(os.getenv('STORY_SIMILARITY', '0.3'))
+STORY_MAX_STORIES = int(os.getenv('STORY_MAX_STORIES', '5000'))
+STORY_MAX_MEMBERS = int(os.getenv('STORY_MAX_MEMBERS', '100'))
+STORY_MAX_AGE = float(os.getenv('STORY_MAX_AGE', '259200'))
+
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _permutations(count, seed=1):
+    """Faste hashfunktioner (a * x + b) mod p, så fingeraftryk er ens på tværs af processer"""
+    rng = random.Random(seed)
+    return [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(count)]
+
+
+def shingles(text):
+    """Mængden af ord-trigrammer i teksten (enkeltord for meget korte tekster)"""
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return set(tokens)
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+class _Member:
+    __slots__ = ('key', 'url', 'source', 'title', 'sentiment', 'seen', 'signature')
+
+    def __init__(self, key, url, source, title, sentiment, seen, signature):
+        self.key = key
+        self.url = url
+        self.source = source
+        self.title = title
+        self.sentiment = sentiment
+        self.seen = seen
+        self.signature = signature
+
+
+class _Story:
+    __slots__ = ('id', 'members', 'keys', 'first_seen', 'last_seen')
+
+    def __init__(self, story_id, seen):
+        self.id = story_id
+        self.members = []
+        self.keys = []
+        self.first_seen = seen
+        self.last_seen = seen
+
+
+class StoryIndex:
+    """MinHash/LSH-indeks over historier; trådsikkert.
+
+    loader(since) kan give (url, kilde, analyse, tidspunkt) for artikler
+    analyseret siden since; de lægges i indekset første gang det bruges,
+    så historierne overlever en genstart.
+    """
+
+    def __init__(self, loader=None, permutations=STORY_PERMUTATIONS, bands=STORY_BANDS,
+                 similarity=STORY_SIMILARITY, max_stories=STORY_MAX_STORIES,
+                 max_members=STORY_MAX_MEMBERS, max_age=STORY_MAX_AGE):
+        if permutations % bands:
+            raise ValueError('STORY_PERMUTATIONS skal være et multiplum af STORY_BANDS')
+        self.loader = loader
+        self.permutations = _permutations(permutations)
+        self.bands = bands
+        self.rows = permutations // bands
+        self.similarity = similarity
+        self.max_stories = max_stories
+        self.max_members = max_members
+        self.max_age = max_age
+        self._stories = OrderedDict()  # ældste opdatering først
+        self._buckets = {}
+        self._urls = {}
+        self._lock = threading.Lock()
+        self._loaded = loader is None
+
+    def signature(self, text):
+        """MinHash-fingeraftryk af teksten, eller None hvis den ikke har nogen ord"""
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)]
+        if not hashes:
+            return None
+        p = MERSENNE_PRIME
+        return array('Q', [min([(a * h + b) % p for h in hashes]) for a, b in self.permutations])
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    @staticmethod
+    def _similarity(first, second):
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+    def _ensure_loaded(self):
+        """Genopbygger indekset fra loader; kaldes med låsen holdt"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            rows = self.loader(time.time() - self.max_age)
+        except Exception as e:
+            print(f"Kunne ikke genopbygge historier: {str(e)}")
+            return
+        for url, source, analysis, seen in rows:
+            self._add(url, source, analysis, seen)
+
+    def _expire(self, now):
+        """Glemmer gamle historier og de ældste ud over loftet; kaldes med låsen holdt"""
+        while self._stories:
+            story = next(iter(self._stories.values()))
+            if len(self._stories) <= self.max_stories and now - story.last_seen < self.max_age:
+                break
+            self._remove(story)
+
+    def _remove(self, story):
+        del self._stories[story.id]
+        for key in story.keys:
+            ids = self._buckets.get(key)
+            if ids is not None:
+                ids.discard(story.id)
+                if not ids:
+                    del self._buckets[key]
+        for member in story.members:
+            self._urls.pop(member.key, None)
+
+    def _add(self, url, source, analysis, seen):
+        key = canonicalize_url(url)
+        if key in self._urls:
+            return self._urls[key]
+        text = f"{analysis.get('title') or ''}\n{analysis.get('summary') or ''}"
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        band_keys = self._band_keys(signature)
+
+        best, best_similarity = None, self.similarity
+        candidates = set()
+        for band_key in band_keys:
+            candidates.update(self._buckets.get(band_key, ()))
+        for story_id in candidates:
+            story = self._stories[story_id]
+            similarity = max(self._similarity(signature, m.signature) for m in story.members)
+            if similarity >= best_similarity:
+                best, best_similarity = story, similarity
+
+        if best is None:
+            best = _Story(hashlib.sha1(key.encode('utf-8')).hexdigest()[:12], seen)
+            self._stories[best.id] = best
+        elif len(best.members) >= self.max_members:
+            # Fulde historier tager ikke flere artikler, så hukommelsen er begrænset
+            return best.id
+        else:
+            self._stories.move_to_end(best.id)
+        best.last_seen = max(best.last_seen, seen)
+        best.first_seen = min(best.first_seen, seen)
+        sentiment = analysis.get('sentiment') or {}
+        best.members.append(_Member(key, url, source, analysis.get('title'), sentiment, seen, signature))
+        self._urls[key] = best.id
+        for band_key in band_keys:
+            ids = self._buckets.setdefault(band_key, set())
+            if best.id not in ids:
+                ids.add(best.id)
+                best.keys.append(band_key)
+        self._expire(best.last_seen)
+        return best.id
+
+    def add(self, url, source, analysis, seen=None):
+        """Lægger en analyseret artikel i sin historie og returnerer historiens id"""
+        seen = time.time() if seen is None else seen
+        with self._lock:
+            self._ensure_loaded()
+            return self._add(url, source, analysis, seen)
+
+    def _summary(self, story):
+        outlets = {}
+        for member in story.members:
+            outlet = outlets.setdefault(member.source or 'ukendt', {'articles': 0, 'scores': [], 'labels': {}})
+            outlet['articles'] += 1
+            score = member.sentiment.get('score')
+            if score is not None:
+                # score er styrken; fortegnet ligger i label, så negative artikler tæller negativt
+                outlet['scores'].append(-score if member.sentiment.get('label') == 'negativ' else score)
+            label = member.sentiment.get('label')
+            if label is not None:
+                outlet['labels'][label] = outlet['labels'].get(label, 0) + 1
+        for outlet in outlets.values():
+            scores = outlet.pop('scores')
+            outlet['sentiment'] = round(sum(scores) / len(scores), 3) if scores else None
+        means = [outlet['sentiment'] for outlet in outlets.values() if outlet['sentiment'] is not None]
+        return {
+            'id': story.id,
+            'title': story.members[0].title,
+            'articles': len(story.members),
+            'first_seen': _iso(story.first_seen),
+            'last_seen': _iso(story.last_seen),
+            'outlets': outlets,
+            'sentiment_spread': round(max(means) - min(means), 3) if means else None
+        }
+
+    def stories(self, min_outlets=2, limit=50, after=None):
+        """De senest opdaterede historier dækket af mindst min_outlets medier.
+
+        Med after begynder listen efter historien med det id; kaster
+        ValueError, hvis den ikke findes længere.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self._expire(time.time())
+            if after is not None and after not in self._stories:
+                raise ValueError('Historien i cursoren findes ikke længere; start forfra')
+            result = []
+            for story in reversed(self._stories.values()):
+                if after is not None:
+                    if story.id == after:
+                        after = None
+                    continue
+                if len({member.source for member in story.members}) < min_outlets:
+                    continue
+                result.append(self._summary(story))
+                if len(result) >= limit:
+                    break
+            return result
+
+    def get(self, story_id):
+        """Én historie med alle dens artikler, eller None"""
+        with self._lock:
+            self._ensure_loaded()
+            story = self._stories.get(story_id)
+            if story is None:
+                return None
+            result = self._summary(story)
+            result['members'] = [
+                {
+                    'url': member.url,
+                    'source': member.source,
+                    'title': member.title,
+                    'sentiment': member.sentiment or None,
+                    'seen': _iso(member.seen)
+                }
+                for member in story.members
+            ]
+            return result
+
+    def __len__(self):
+        with self._lock:
+            return len(self._stories)
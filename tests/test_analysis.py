@@ -0,0 +1,40 @@
+import os
+
+# Testene må ikke skrive dokumentfrekvenser til instance/
+os.environ.setdefault('KEYWORDS_DF_PATH', '')
+
+import pytest  # noqa: E402
+
+import analysis  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'artikel.html')
+
+
+def read_fixture():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_count_sources_counts_quotes_and_attributions():
+    text = (
+        '– Vi skal have mere grøn strøm, siger ministeren.\n'
+        'Udspillet kommer i dag. Det er dyrt, sagde ordføreren.\n'
+        '„Det er skatteydernes penge,“ lød det fra oppositionen.\n'
+        'Ifølge Energistyrelsen kan parkerne forsyne fire millioner husstande.'
+    )
+    assert analysis.count_sources(text) == 4
+    assert analysis.count_sources('Udspillet kommer i dag.') == 0
+    assert analysis.count_sources('') == 0
+
+
+def test_analyze_html_on_fixture():
+    pytest.importorskip('newspaper')
+    result = analysis.analyze_html('https://www.example.dk/politik/havvind', read_fixture())
+
+    assert 'error' not in result
+    assert result['title'] == 'Regeringen vil bygge flere vindmøller på havet'
+    assert result['sources_count'] >= 4
+    assert result['sentiment']['label'] in ('positiv', 'negativ', 'neutral')
+    assert result['keywords']
+    assert any('havvind' in keyword for keyword in result['keywords'])
+    assert result['summary']
@@ -0,0 +1,77 @@
+import codecs
+
+import pytest
+
+from download import (
+    FEED_TYPES, TooLarge, UnsupportedContent, check_headers, iter_text, limit_bytes, sniff_charset
+)
+
+PAGE = '<html><head><meta charset="windows-1252"><title>Æblegrød</title></head><body>{}</body></html>'
+
+
+def chunked(data, size=7):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def decode(chunks, **kwargs):
+    return ''.join(iter_text(chunks, **kwargs))
+
+
+def test_meta_charset_decodes_windows_1252():
+    html = PAGE.format('Københavns æbler og søer ' * 300)
+    assert decode(chunked(html.encode('windows-1252'), 1000)) == html
+
+
+def test_content_type_charset_wins_over_meta():
+    html = PAGE.format('blåbær')
+    assert decode([html.encode('iso-8859-1')], content_type='text/html; charset=iso-8859-1') == html
+
+
+def test_undeclared_latin_page_falls_back_to_windows_1252():
+    assert sniff_charset('Søndag i Århus, med æbler og pærer'.encode('windows-1252')) == 'windows-1252'
+
+
+def test_utf8_split_across_chunks_is_not_mistaken_for_latin():
+    data = ('a' * 4095 + 'ø').encode('utf-8')
+    assert sniff_charset(data[:4096]) == 'utf-8'
+    assert decode(chunked(data, 4096)) == 'a' * 4095 + 'ø'
+
+
+def test_bom_is_respected():
+    assert decode([codecs.BOM_UTF8 + 'æøå'.encode('utf-8')]) == 'æøå'
+
+
+def test_body_over_the_limit_raises():
+    with pytest.raises(TooLarge):
+        decode(chunked(b'x' * 100, 10), max_bytes=50)
+
+
+def test_truncate_keeps_the_text_up_to_the_limit():
+    assert decode(chunked(b'x' * 100, 30), max_bytes=50, truncate=True) == 'x' * 50
+
+
+def test_truncate_does_not_read_past_the_limit():
+    read = []
+
+    def chunks():
+        for chunk in chunked(b'x' * 100, 10):
+            read.append(chunk)
+            yield chunk
+
+    decode(chunks(), max_bytes=25, truncate=True)
+    assert len(read) == 3
+
+
+def test_limit_bytes():
+    assert b''.join(limit_bytes([b'ab', b'cd'], 4)) == b'abcd'
+    with pytest.raises(TooLarge):
+        list(limit_bytes([b'ab', b'cd', b'e'], 4))
+
+
+def test_check_headers():
+    check_headers({'Content-Type': 'text/html; charset=utf-8', 'Content-Length': '10'}, max_bytes=10)
+    check_headers({'Content-Type': 'application/rss+xml'}, FEED_TYPES)
+    with pytest.raises(UnsupportedContent):
+        check_headers({'Content-Type': 'application/pdf'})
+    with pytest.raises(TooLarge):
+        check_headers({'Content-Length': '11'}, max_bytes=10)
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from feeds import extract_entries, parse_date
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+BASE_URL = 'https://www.medie.dk/rss'
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def chunked(data, size=64):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def test_rss_items():
+    entries = extract_entries(chunked(fixture('rss.xml')), BASE_URL)
+    assert entries == [
+        {'url': 'https://www.medie.dk/politik/finanslov', 'title': 'Regeringen fremlægger finanslov',
+         'published': '2024-05-14T06:30:00+00:00'},
+        {'url': 'https://www.medie.dk/indland/storm', 'title': 'Storm lukker Storebæltsbroen',
+         'published': '2024-05-14T06:00:00+00:00'},
+        # Relative links løses op mod feedets URL; en guid der ikke er et link, springes over
+        {'url': 'https://www.medie.dk/sport/landsholdet', 'title': 'Landsholdet vinder', 'published': None}
+    ]
+
+
+def test_atom_entries_use_the_alternate_link():
+    entries = extract_entries(chunked(fixture('atom.xml')), BASE_URL)
+    assert [entry['url'] for entry in entries] == [
+        'https://www.medie.dk/klima/plan', 'https://www.medie.dk/politik/valg'
+    ]
+    assert entries[0]['title'] == 'Ny klimaplan præsenteret'
+    assert entries[0]['published'] == '2024-05-14T05:15:00+00:00'
+    # Uden published bruges updated
+    assert entries[1]['published'] == '2024-05-13T18:00:00+00:00'
+
+
+def test_news_sitemap():
+    entries = extract_entries(chunked(fixture('sitemap.xml')), BASE_URL)
+    assert entries == [
+        {'url': 'https://www.medie.dk/indland/skole', 'title': 'Skolereform vedtaget',
+         'published': '2024-05-14T08:00:00+00:00'},
+        {'url': 'https://www.medie.dk/kultur/film', 'title': '', 'published': '2024-05-12T00:00:00+00:00'}
+    ]
+
+
+def test_accept_and_limit_stop_early():
+    read = []
+
+    def chunks():
+        for chunk in chunked(fixture('rss.xml')):
+            read.append(chunk)
+            yield chunk
+
+    entries = extract_entries(chunks(), BASE_URL, accept=lambda url: '/indland/' not in url, limit=1)
+    assert [entry['url'] for entry in entries] == ['https://www.medie.dk/politik/finanslov']
+    assert len(read) < len(chunked(fixture('rss.xml')))
+
+
+def test_truncated_feed_keeps_the_entries_it_got():
+    data = fixture('rss.xml')
+    entries = extract_entries([data[:data.index(b'<item>', data.index(b'</item>'))] + b'<item><ti'], BASE_URL)
+    assert [entry['title'] for entry in entries] == ['Regeringen fremlægger finanslov']
+
+
+def test_invalid_feed_raises():
+    with pytest.raises(ValueError):
+        extract_entries([b'<html><body><p>Ikke et feed</body>'], BASE_URL)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('Tue, 14 May 2024 08:30:00 +0200', '2024-05-14T06:30:00+00:00'),
+    ('2024-05-14T08:30:00Z', '2024-05-14T08:30:00+00:00'),
+    ('2024-05-14', '2024-05-14T00:00:00+00:00'),
+    ('i går', None),
+    (None, None)
+])
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
@@ -0,0 +1,34 @@
+import os
+import pickle
+
+# Testene må ikke skrive dokumentfrekvenser til instance/
+os.environ.setdefault('KEYWORDS_DF_PATH', '')
+
+import keywords  # noqa: E402
+
+
+def test_seed_frequencies_weight_common_words_down():
+    frequencies = keywords.DocumentFrequencies(seed_path=keywords.KEYWORDS_DF_SEED)
+    assert frequencies.documents > 0
+    assert frequencies.idf('danmark') < frequencies.idf('havvindmølleparker')
+
+
+def test_summary_skips_repeated_sentences():
+    boilerplate = 'Læs også om regeringens nye udspil om havvind i Nordsøen.'
+    text = '\n'.join([
+        boilerplate,
+        'Regeringen vil fordoble kapaciteten af havvind i Nordsøen inden 2030.',
+        boilerplate,
+        'Oppositionen kritiserer statens medejerskab af havvindmølleparkerne.',
+        boilerplate
+    ])
+    _, summary, _ = keywords.extract('Havvind i Nordsøen', text)
+    assert summary.split('\n').count(boilerplate) == 1
+
+
+def test_prepared_document_survives_pickling():
+    # prepare() kører i procespuljen; rank() i hovedprocessen
+    document = pickle.loads(pickle.dumps(keywords.prepare('Havvind', 'Regeringen vil bygge havvind i Nordsøen.')))
+    found, summary = keywords.rank(document)
+    assert 'havvind' in found
+    assert summary
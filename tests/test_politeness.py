@@ -0,0 +1,171 @@
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+import politeness
+from politeness import CircuitBreaker, HostScheduler, retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(politeness.time, 'monotonic', clock)
+    return clock
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_repeated_failures(clock):
+    breaker = CircuitBreaker(failures=3, cooldown=10, max_cooldown=40)
+    fail(breaker, 2)
+    assert breaker.state == 'closed' and breaker.allow()
+    fail(breaker, 1)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.snapshot()['retry_in_s'] == 10
+
+
+def test_breaker_lets_a_single_probe_through_when_half_open(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=10, max_cooldown=40)
+    fail(breaker, 1)
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # Kun én prøve ad gangen
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_breaker_release_frees_the_probe(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=10)
+    fail(breaker, 1)
+    clock.now += 10
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_breaker_cooldown_doubles_up_to_the_cap(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=10, max_cooldown=25)
+    fail(breaker, 1)
+    cooldowns = []
+    for _ in range(3):
+        clock.now += breaker.cooldown
+        assert breaker.allow()
+        fail(breaker, 1)
+        cooldowns.append(breaker.cooldown)
+    assert cooldowns == [20, 25, 25]
+    assert breaker.state == 'open'
+    breaker.record_success()
+    assert breaker.cooldown == 10
+
+
+def test_retry_after_seconds():
+    assert retry_after('120') == 120.0
+    assert retry_after('-5') == 0.0
+
+
+def test_retry_after_http_date():
+    now = time.time()
+    assert retry_after(formatdate(now + 60, usegmt=True), now=now) == pytest.approx(60, abs=1)
+    # En dato der er passeret giver ingen ventetid
+    assert retry_after(formatdate(now - 60, usegmt=True), now=now) == 0.0
+
+
+@pytest.mark.parametrize('value', [None, '', 'snart'])
+def test_retry_after_invalid(value):
+    assert retry_after(value) is None
+
+
+class Response:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Session:
+    def __init__(self, body, status_code=200, delay=0.0):
+        self.body = body
+        self.status_code = status_code
+        self.delay = delay
+        self.calls = []
+
+    def get(self, url, timeout, stream=False):
+        self.calls.append((url, timeout))
+        time.sleep(self.delay)
+        return Response(self.body, self.status_code)
+
+
+def scheduler(session, **kwargs):
+    return HostScheduler(lambda: session, 'Mediekompasset', min_interval=0, **kwargs)
+
+
+def test_robots_rules_are_cached_per_host():
+    session = Session(b'User-agent: *\nDisallow: /privat/\n')
+    hosts = scheduler(session)
+    assert not hosts.allowed('https://medie.dk/privat/side')
+    assert hosts.allowed('https://medie.dk/nyheder/artikel')
+    assert len(session.calls) == 1
+
+
+def test_robots_fetch_uses_the_remaining_deadline():
+    session = Session(b'')
+    hosts = scheduler(session, timeout=(3.05, 5))
+    assert hosts.allowed('https://medie.dk/a', until=time.monotonic() + 1)
+    connect, read = session.calls[0][1]
+    assert connect <= 1 and read <= 1
+
+
+def test_robots_past_deadline_is_not_fetched_or_cached():
+    session = Session(b'User-agent: *\nDisallow: /\n')
+    hosts = scheduler(session)
+    assert hosts.allowed('https://medie.dk/a', until=time.monotonic() - 1)
+    assert session.calls == []
+    assert not hosts.allowed('https://medie.dk/a')
+
+
+def test_oversized_robots_is_ignored(monkeypatch):
+    monkeypatch.setattr(politeness, 'ROBOTS_MAX_BYTES', 64)
+    session = Session(b'User-agent: *\nDisallow: /\n' + b'#' * 1000)
+    assert scheduler(session).allowed('https://medie.dk/a')
+
+
+def test_robots_is_fetched_once_for_concurrent_callers():
+    session = Session(b'User-agent: *\nDisallow: /\n', delay=0.1)
+    hosts = scheduler(session)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(hosts.allowed('https://medie.dk/a')))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [False] * 5
+    assert len(session.calls) == 1
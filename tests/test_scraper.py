@@ -0,0 +1,84 @@
+import os
+import time
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+import scraper  # noqa: E402
+from feeds import extract_entries  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+FEED_URL = 'https://www.medie.dk/rss'
+
+
+class Raw:
+    def __init__(self):
+        self.read = 0
+
+    def tell(self):
+        return self.read
+
+
+class Response:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.url = FEED_URL
+        self.raw = Raw()
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), size):
+            self.raw.read += len(self.body[start:start + size])
+            yield self.body[start:start + size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Session:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def get(self, url, timeout, stream=False, headers=None):
+        self.headers.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    with open(os.path.join(FIXTURES, 'rss.xml'), 'rb') as f:
+        body = f.read()
+    session = Session(
+        Response(200, body, {'Content-Type': 'application/rss+xml', 'ETag': '"v1"'}),
+        Response(304, headers={'ETag': '"v1"'})
+    )
+    monkeypatch.setattr(scraper, 'get_session', lambda: session)
+    monkeypatch.setattr(scraper.scheduler, 'min_interval', 0)
+    monkeypatch.setattr(scraper, '_feed_cache', {})
+    return session
+
+
+def test_not_modified_feed_reuses_the_cached_articles(session):
+    calls = []
+
+    def extract(source, url, chunks, kind='html'):
+        calls.append(url)
+        return extract_entries(chunks, url)
+
+    first, _ = scraper._download('Medie', FEED_URL, extract, time.monotonic() + 5, feed=True)
+    second, response = scraper._download('Medie', FEED_URL, extract, time.monotonic() + 5, feed=True)
+
+    assert session.headers == [{}, {'If-None-Match': '"v1"'}]
+    assert response.status_code == 304
+    assert second == first and len(first) == 3
+    assert len(calls) == 1
@@ -0,0 +1,49 @@
+import sentiment
+from sentiment import Lexicon
+
+
+def weights(text, lexicon=None):
+    return (lexicon or sentiment.get_lexicon()).score_tokens(sentiment.tokenize(text))
+
+
+def test_negation_flips_the_next_expression_only():
+    assert weights('ikke god') == (0.0, 2.0)
+    # Kun første udtryk efter negationen vendes
+    assert weights('ikke god og god') == (2.0, 2.0)
+
+
+def test_negated_negative_word_counts_as_positive():
+    assert sentiment.score('ikke i krise')['label'] == 'positiv'
+
+
+def test_negation_scope_is_limited_to_the_window():
+    # 'god' står fire ord efter 'ikke' og er uden for vinduet
+    assert weights('ikke nogen som helst god') == (2.0, 0.0)
+
+
+def test_men_ends_the_negation():
+    assert weights('ikke, men god') == (2.0, 0.0)
+    # 'ingen' vender 'fremgang', men ikke 'vækst' efter 'men'
+    assert weights('Ingen fremgang, men vækst') == (2.0, 2.0)
+    assert sentiment.score('Ingen fremgang, men vækst')['label'] == 'neutral'
+
+
+def test_phrase_wins_over_its_words():
+    lexicon = Lexicon([('sort', -1.0), ('dag', 0.5), ('sort dag', -3.0)])
+    assert weights('en sort dag', lexicon) == (0.0, 3.0)
+    assert weights('en sort bil en dag', lexicon) == (0.5, 1.0)
+
+
+def test_longest_phrase_is_matched_first():
+    lexicon = Lexicon([('god nyhed', 3.0), ('god nyhed for alle', 5.0)])
+    assert weights('en god nyhed for alle', lexicon) == (5.0, 0.0)
+
+
+def test_negated_phrase():
+    lexicon = Lexicon([('går konkurs', -3.0)])
+    assert weights('firmaet går ikke konkurs', lexicon) == (0.0, 0.0)
+    assert weights('ikke går konkurs', lexicon) == (3.0, 0.0)
+
+
+def test_score_without_sentiment_words_is_neutral():
+    assert sentiment.score('Mødet begynder klokken ti.') == {'label': 'neutral', 'score': 0}
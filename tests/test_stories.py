@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from stories import StoryIndex
+
+TITLE = 'Regeringen præsenterer ny klimaplan med afgift på landbrugets udledninger'
+
+
+def article(title, label='neutral', score=0.0):
+    return {'title': title, 'summary': '', 'sentiment': {'label': label, 'score': score}}
+
+
+def test_near_duplicate_titles_join_the_same_story():
+    index = StoryIndex()
+    first = index.add('https://dr.dk/nyheder/klimaplan', 'DR', article(TITLE))
+    second = index.add('https://tv2.dk/klimaplan', 'TV2', article(TITLE + ' i dag'))
+    assert first == second
+    assert index.get(first)['articles'] == 2
+
+
+def test_unrelated_titles_stay_apart():
+    index = StoryIndex()
+    first = index.add('https://dr.dk/a', 'DR', article(TITLE))
+    second = index.add('https://dr.dk/b', 'DR', article('Landsholdet vinder kampen efter straffespark i forlænget spilletid'))
+    assert first != second
+    assert len(index) == 2
+
+
+def test_same_url_is_only_added_once():
+    index = StoryIndex()
+    story_id = index.add('https://www.dr.dk/a?utm_source=x', 'DR', article(TITLE))
+    assert index.add('https://dr.dk/a', 'DR', article(TITLE)) == story_id
+    assert index.get(story_id)['articles'] == 1
+
+
+def test_full_story_takes_no_more_members():
+    index = StoryIndex(max_members=2)
+    story_id = None
+    for outlet in ('dr', 'tv', 'berlingske'):
+        story_id = index.add(f'https://{outlet}.dk/klimaplan', outlet, article(TITLE))
+    assert index.get(story_id)['articles'] == 2
+
+
+def test_old_stories_are_forgotten():
+    index = StoryIndex(max_age=60)
+    old = index.add('https://dr.dk/a', 'DR', article(TITLE), seen=time.time() - 120)
+    assert index.get(old) is not None
+    index.add('https://dr.dk/b', 'DR', article('Landsholdet vinder kampen efter straffespark'))
+    assert index.get(old) is None
+
+
+def test_cursor_on_an_evicted_story_raises():
+    index = StoryIndex(max_stories=1)
+    first = index.add('https://dr.dk/a', 'DR', article(TITLE))
+    index.add('https://dr.dk/b', 'DR', article('Landsholdet vinder kampen efter straffespark'))
+    with pytest.raises(ValueError):
+        index.stories(min_outlets=1, after=first)
+
+
+def test_stories_paginate_after_a_story():
+    index = StoryIndex()
+    first = index.add('https://dr.dk/a', 'DR', article(TITLE))
+    second = index.add('https://dr.dk/b', 'DR', article('Landsholdet vinder kampen efter straffespark'))
+    assert [story['id'] for story in index.stories(min_outlets=1)] == [second, first]
+    assert [story['id'] for story in index.stories(min_outlets=1, after=second)] == [first]
+    assert index.stories(min_outlets=2) == []
+
+
+def test_summary_signs_sentiment_by_label():
+    index = StoryIndex()
+    story_id = index.add('https://dr.dk/a', 'DR', article(TITLE, 'negativ', 0.6))
+    index.add('https://tv2.dk/a', 'TV2', article(TITLE, 'positiv', 0.2))
+    summary = index.get(story_id)
+    assert summary['outlets']['DR']['sentiment'] == -0.6
+    assert summary['outlets']['TV2']['sentiment'] == 0.2
+    assert summary['sentiment_spread'] == 0.8
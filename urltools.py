@@ -0,0 +1,99 @@
+"""Hjælpefunktioner til normalisering af URL'er"""
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Parametre der kun bruges til sporing og ikke ændrer indholdet
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', 'ref', 'ref_src', 'cmpid', 'xcmp'
+}
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking(param):
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+
+def _clean_query(query):
+    return [
+        (key, value) for key, value in parse_qsl(query, keep_blank_values=True)
+        if not _is_tracking(key)
+    ]
+
+
+def clean_url(url):
+    """Fjerner sporingsparametre og fragment, men bevarer skema og vært"""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(_clean_query(parts.query)), ''))
+
+
+def canonicalize_url(url):
+    """Normaliserer en URL så samme artikel altid giver samme nøgle.
+
+    Skema og 'www.' ignoreres, sporingsparametre og fragmenter fjernes, og de
+    resterende parametre sorteres.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    scheme = parts.scheme.lower() or 'https'
+    if scheme == 'http':
+        scheme = 'https'
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        netloc = f'{host}:{parts.port}'
+
+    path = parts.path or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query = sorted(_clean_query(parts.query))
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+def validate_url(url):
+    """Returnerer url, hvis den er en tekst der kan normaliseres; kaster ellers ValueError.
+
+    Fanger fx ugyldige porte ('http://example.com:abc/x'), som ellers først
+    fejler dybt inde i cachen eller køen.
+    """
+    if not isinstance(url, str) or not url.strip():
+        raise ValueError('URL er påkrævet')
+    try:
+        canonicalize_url(url)
+    except ValueError as e:
+        raise ValueError(f'Ugyldig URL: {str(e)}') from e
+    return url
+
+
+def registrable_domain(host):
+    """Det registrerbare domæne for et værtsnavn, fx 'nyheder.tv2.dk' -> 'tv2.dk'.
+
+    Alle fulgte medier ligger direkte under et topdomæne (.dk), så de to
+    sidste labels er nok; der bruges ikke en public suffix-liste.
+    """
+    labels = host.lower().rstrip('.').split('.')
+    return '.'.join(labels[-2:])
+
+
+class HostIndex:
+    """Opslag fra registrerbart domæne til medie, bygget én gang ud fra MEDIA_SOURCES"""
+
+    def __init__(self, sources):
+        self._by_domain = {}
+        for name, url in sources.items():
+            host = urlsplit(url).hostname
+            if host:
+                self._by_domain.setdefault(registrable_domain(host), name)
+
+    def lookup(self, url):
+        """Returnerer mediet der ejer URL'en, eller None"""
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            return None
+        if not host:
+            return None
+        return self._by_domain.get(registrable_domain(host))